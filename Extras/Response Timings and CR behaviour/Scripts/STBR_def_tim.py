@@ -4,7 +4,7 @@ STARTING_BAUD       = 9600
 TX_NEWLINE          = "\r"
 
 IDLE_GAP_SEC        = 0.30   # stop reading after this much quiet time
-READ_SLICE_SLEEP    = 0.004  # faster polling to catch immediate banner
+READ_TIMEOUT_SEC    = 0.001  # default read slice; read_until() uses the idle gap as its timeout
 
 BASE_DELAY          = 1
 STRSTNVM_DELAY      = 3
@@ -29,68 +29,74 @@ SEQUENCE = [
 ]
 
 from serial     import Serial
-from time       import sleep, time, monotonic
+from time       import sleep, perf_counter_ns
 from datetime   import datetime
 from os.path    import abspath, basename, splitext
+from serial_timing import begin_timing, buffered_log, end_timing, num_arg, open_port
 
 # ===== HELPERS =====
 def write_log(f, text: str):
-    f.write(text + ("\n" if not text.endswith("\n") else ""))
+    f.write(text + "\n")
+
+# Byte -> text lookup table, built once at import
+_VIS = [f"\\x{x:02X}" for x in range(256)]
+for x in range(0x21, 0x7F):
+    _VIS[x] = chr(x)
+_VIS[0x20] = "·"
+_VIS[0x0D] = "<CR>"
+_VIS[0x0A] = "<LF>\n"
+_VIS[0x09] = "<TAB>"
 
 def make_visible(data: bytes):
-    chars = []
-    for x in data:
-        if not x:
-            break
-        if   x == 0x20:         chars.append("·")
-        elif x == 0x0D:         chars.append("<CR>")
-        elif x == 0x0A:         chars.append("<LF>\n")
-        elif x == 0x09:         chars.append("<TAB>")
-        elif 0x21 <= x <= 0x7E: chars.append(chr(x))
-        else:                   chars.append(f"\\x{x:02X}")
-    return "".join(chars)
+    """Render bytes for the log, stopping at the first NUL."""
+    return "".join([_VIS[x] for x in data.split(b"\0", 1)[0]])
+
+def hex_bytes(data: bytes):
+    hex_str = data.hex(" ").upper()
+    return hex_str.replace("00", "\\0") if b"\0" in data else hex_str
 
 def read_until(ser: Serial, delay: float = IDLE_GAP_SEC, command: bytes | None = None):
     """
     Read until the device is quiet for `delay` seconds OR until `command` is detected.
-    Returns: (log_data, visible_bytes, hex_bytes, t_first, t_last, t_found)
+    Returns: (log_data, t_first, t_last, t_found)
     """
-    buf = bytearray()
-    last_rx_wall = time()
+    chunks = []       # joined once at the end
+    tail   = b""      # last len(command)-1 bytes, to catch a match split across reads
 
     t_first = None
     t_last  = None
     t_found = None
 
+    _read = ser.read  # bound once, outside the loop
+    ser.timeout = delay  # read(1) wakes on the first byte, or returns empty after `delay` of silence
     while True:
-        n = ser.in_waiting
-        if n:
-            chunk = ser.read(n)
-            now = monotonic()
-            if t_first is None:
-                t_first = now
-            t_last = now
-
-            buf += chunk
-            last_rx_wall = time()
-
-            if command and (t_found is None) and (command in buf):
+        chunk = _read(1)
+        if not chunk:
+            break
+        now = perf_counter_ns()
+        chunk += _read(ser.in_waiting)
+        if t_first is None:
+            t_first = now
+        t_last = now
+
+        chunks.append(chunk)
+
+        if command and (t_found is None):
+            window = tail + chunk
+            if command in window:
                 t_found = now
                 break
+            tail = window[max(0, len(window) - len(command) + 1):]
 
-            sleep(READ_SLICE_SLEEP)
-        elif (time() - last_rx_wall) >= delay:
-            break
-        else:
-            sleep(READ_SLICE_SLEEP)
+    ser.timeout = READ_TIMEOUT_SEC
 
-    log_data = bytes(buf)
-    hex_bytes = " ".join(f"{x:02X}" if x else "\\0" for x in log_data)
-    visible_bytes = make_visible(log_data)
-    return log_data, visible_bytes, hex_bytes, t_first, t_last, t_found
+    return b"".join(chunks), t_first, t_last, t_found
 
-def write_log_section(log, log_data, visible_bytes, hex_bytes):
-    write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes}")
+def write_log_section(log, log_data):
+    """Format and log a response; kept off the read path. Returns the visible text."""
+    visible_bytes = make_visible(log_data)
+    write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes(log_data)}")
+    return visible_bytes
 
 def send_and_log_simple(ser: Serial, cmd: str, delay: float, log, num: int):
     """Generic command sender (used for non-STBR commands)."""
@@ -102,17 +108,17 @@ def send_and_log_simple(ser: Serial, cmd: str, delay: float, log, num: int):
         cmd += TX_NEWLINE
     cmd_b = cmd.encode("ascii", errors="ignore")
 
-    sleep(0.02)
+    # The previous read ended on an idle gap, so nothing is in flight; just purge.
     ser.reset_input_buffer()
     ser.write(cmd_b)
 
     if delay:
         sleep(delay)
 
-    log_data, visible_bytes, hex_bytes, *_ = read_until(ser)
+    log_data, *_ = read_until(ser)
+    visible_bytes = write_log_section(log, log_data)
     if not visible_bytes:
         print("Warning: No visible bytes received")
-    write_log_section(log, log_data, visible_bytes, hex_bytes)
     return num + 1
 
 def stbr_fast_switch(ser: Serial, new_baud: int, log, num: int, old_baud: int):
@@ -133,9 +139,7 @@ def stbr_fast_switch(ser: Serial, new_baud: int, log, num: int, old_baud: int):
     ser.write((cmd + TX_NEWLINE).encode("ascii", errors="ignore"))
 
     # 1) Read ONLY until OK\r at OLD baud
-    log_data_ok, vis_ok, hex_ok, tf, tl, t_ok = read_until(ser, delay=OK_WAIT_SEC, command=OK_CR)
-    write_log_section(log, log_data_ok, vis_ok, hex_ok)
-
+    log_data_ok, tf, tl, t_ok = read_until(ser, delay=OK_WAIT_SEC, command=OK_CR)
     t_ok_time = t_ok if t_ok is not None else tl
 
     # 2) Switch to NEW baud IN-PLACE immediately (no close/reopen)
@@ -143,30 +147,32 @@ def stbr_fast_switch(ser: Serial, new_baud: int, log, num: int, old_baud: int):
     ser.reset_input_buffer()
 
     # 3) Read banner at NEW baud
-    log_data_bn, vis_bn, hex_bn, tfb, tlb, t_bn = read_until(ser, delay=BANNER_WAIT_SEC, command=BANNER)
-    write_log(log, "\n--- [BANNER @ NEW BAUD] ---")
-    write_log_section(log, log_data_bn, vis_bn, hex_bn)
-
+    log_data_bn, tfb, tlb, t_bn = read_until(ser, delay=BANNER_WAIT_SEC, command=BANNER)
     t_banner_time = t_bn if t_bn is not None else tlb
 
     # 4) Do NOT send ACK. Switch back to OLD baud quickly, wait for OK\r\r> on OLD baud.
     ser.baudrate = old_baud
     ser.reset_input_buffer()
 
-    log_data_pr, vis_pr, hex_pr, tfp, tlp, t_pr = read_until(ser, delay=PROMPT_WAIT_SEC, command=PROMPT)
-    write_log(log, "\n--- [PROMPT @ OLD BAUD] ---")
-    write_log_section(log, log_data_pr, vis_pr, hex_pr)
+    log_data_pr, tfp, tlp, t_pr = read_until(ser, delay=PROMPT_WAIT_SEC, command=PROMPT)
 
     t_prompt_time = t_pr if t_pr is not None else tlp
 
+    # Format/log the three reads only now, after the timed handshake
+    write_log_section(log, log_data_ok)
+    write_log(log, "\n--- [BANNER @ NEW BAUD] ---")
+    write_log_section(log, log_data_bn)
+    write_log(log, "\n--- [PROMPT @ OLD BAUD] ---")
+    write_log_section(log, log_data_pr)
+
     # Compute times
     if (t_ok_time is not None) and (t_banner_time is not None):
-        T1_ms = (t_banner_time - t_ok_time) * 1000.0
+        T1_ms = (t_banner_time - t_ok_time) / 1e6
         print(f"T1 (old OK -> banner) = {T1_ms:.3f} ms")
         write_log(log, f"\nT1 (old OK -> banner) = {T1_ms:.3f} ms")
 
     if (t_banner_time is not None) and (t_prompt_time is not None):
-        T2_ms = (t_prompt_time - t_banner_time) * 1000.0
+        T2_ms = (t_prompt_time - t_banner_time) / 1e6
         print(f"T2 (banner -> OK\\r\\r>) = {T2_ms:.3f} ms")
         write_log(log, f"T2 (banner -> OK\\r\\r>) = {T2_ms:.3f} ms")
 
@@ -178,18 +184,18 @@ def main():
     LOG_FILE = f"{splitext(basename(__file__))[0]}.txt"
 
     try:
-        with open(LOG_FILE, "w", encoding="utf-8") as log:
+        with buffered_log(LOG_FILE) as log:
             write_log(log, f"=== SEQUENCE TEST (FAST BAUD SWITCH, NO STBRT, NO ACK) ===\nStarted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"Log file: {abspath(LOG_FILE)}")
 
             num = 0
-            with Serial(PORT, baudrate=baud, timeout=0) as port:
+            with open_port(PORT, baud, READ_TIMEOUT_SEC) as port:
                 print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
                 write_log(log, f"\nStarted: Baud = {baud}")
 
                 for cmd, delay in SEQUENCE:
                     if cmd.upper().startswith("STBR "):
-                        new_baud = int([x for x in cmd.split() if x.isdigit()][0])
+                        new_baud = num_arg(cmd)
                         num = stbr_fast_switch(port, new_baud=new_baud, log=log, num=num, old_baud=baud)
 
                         # After the handshake we stay at OLD baud (per your requirement)
@@ -204,4 +210,8 @@ def main():
     print(f"\n✅ Done. Log saved to: {abspath(LOG_FILE)}")
 
 if __name__ == "__main__":
-    main()
+    begin_timing()
+    try:
+        main()
+    finally:
+        end_timing()
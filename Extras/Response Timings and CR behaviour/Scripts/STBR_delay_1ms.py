@@ -4,7 +4,7 @@ STARTING_BAUD       = 9600
 TX_NEWLINE          = "\r"
 
 IDLE_GAP_SEC        = 0.3                       # stop reading after this much quiet time
-READ_SLICE_SLEEP    = 0.04                      # check serial port for new data after this much time
+READ_TIMEOUT_SEC    = 0.001                     # default read slice; read_until() uses the idle gap as its timeout
 BASE_DELAY          = 1
 STRSTNVM_DELAY      = 3
 ATZ_DELAY           = 2
@@ -17,7 +17,7 @@ COMMAND_TO_SEND     = '\r'
 BANNER              = b"STN2120 v5.6.5\r"
 PROMPT              = b"OK\r\r>"
 
-# Timing globals (monotonic seconds)
+# Timing globals (perf_counter_ns integer nanoseconds)
 t_ok_old = None   # timestamp when old-baud OK\r (after STBR) completed
 
 # ===== SEQUENCE =====
@@ -31,76 +31,80 @@ SEQUENCE = [
 ]
 
 from serial     import Serial
-from time       import sleep, time, monotonic
+from time       import sleep, perf_counter_ns
 from datetime   import datetime
 from os.path    import abspath, basename, splitext
+from serial_timing import begin_timing, buffered_log, end_timing, num_arg, open_port
 
 # ===== HELPERS =====
 def write_log(f, text:str):
-    f.write(text + ("\n" if not text.endswith("\n") else ""))
+    f.write(text + "\n")
+
+# Byte -> text lookup table, built once at import
+_VIS = [f"\\x{x:02X}" for x in range(256)]
+for x in range(0x21, 0x7F):
+    _VIS[x] = chr(x)
+_VIS[0x20] = "·"
+_VIS[0xd]  = "<CR>"
+_VIS[0xa]  = "<LF>\n"
+_VIS[0x9]  = "<TAB>"
     
 def read_until(ser:Serial, delay:float=IDLE_GAP_SEC, command=None):
     '''
     Keep reading until the device is quiet for `delay` seconds OR until `command` is detected.
-    Returns: (log_data, visible_bytes, hex_bytes, t_first, t_last, t_found)
-      - t_first: monotonic timestamp of first received byte (None if no data)
-      - t_last : monotonic timestamp of last received byte (None if no data)
-      - t_found: monotonic timestamp when `command` is first detected in the buffer (None if not used/not found)
+    Returns: (log_data, t_first, t_last, t_found)
+      - t_first: perf_counter_ns timestamp of first received byte (None if no data)
+      - t_last : perf_counter_ns timestamp of last received byte (None if no data)
+      - t_found: perf_counter_ns timestamp when `command` is first detected in the buffer (None if not used/not found)
     '''
-    buf = bytearray()
-    last_rx_wall = time()
+    chunks = []       # joined once at the end
+    tail   = b""      # last len(command)-1 bytes, to catch a match split across reads
 
     t_first = None
     t_last  = None
     t_found = None
 
+    _read = ser.read  # bound once, outside the loop
+    ser.timeout = delay  # read(1) wakes on the first byte, or returns empty after `delay` of silence
     while True:
-        n = ser.in_waiting
-        if n:
-            chunk = ser.read(n)
-            now = monotonic()
+        chunk = _read(1)
+        if not chunk:
+            break
+        now = perf_counter_ns()
+        chunk += _read(ser.in_waiting)
 
-            if t_first is None:
-                t_first = now
-            t_last = now
+        if t_first is None:
+            t_first = now
+        t_last = now
 
-            buf += chunk
-            last_rx_wall = time()
+        chunks.append(chunk)
 
-            # Stop immediately if target pattern is detected
-            if command and (t_found is None) and (command in buf):
+        # Stop immediately if target pattern is detected
+        if command and (t_found is None):
+            window = tail + chunk
+            if command in window:
                 t_found = now
                 break
+            tail = window[max(0, len(window) - len(command) + 1):]
 
-            sleep(READ_SLICE_SLEEP)
-
-        elif (time() - last_rx_wall) >= delay:
-            break
-        else:
-            sleep(READ_SLICE_SLEEP)
+    ser.timeout = READ_TIMEOUT_SEC
 
-    log_data = bytes(buf)
-
-    hex_bytes = " ".join(f"{x:02X}" if x else '\0' for x in log_data)
-    visible_bytes = make_visible(log_data)
-
-    return log_data, visible_bytes, hex_bytes, t_first, t_last, t_found
+    return b"".join(chunks), t_first, t_last, t_found
 
 def make_visible(bytes):
-    chars = []
-    for x in bytes:
-        if not x: break
-        if   x == 0x20:         chars.append("·")
-        elif x == 0xd:          chars.append("<CR>")
-        elif x == 0xa:          chars.append("<LF>\n")
-        elif x == 0x9:          chars.append("<TAB>")
-        elif 0x21 <= x <= 0x7E: chars.append(chr(x))
-        else:                   chars.append(f"\\x{x:02X}")
-    visible_bytes = "".join(chars)
+    # Stop at the first NUL, as before
+    visible_bytes = "".join([_VIS[x] for x in bytes.split(b"\0", 1)[0]])
     return visible_bytes
 
-def write_log_section(log, log_data, visible_bytes, hex_bytes):
-    write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes}")
+def hex_bytes(bytes):
+    hex_str = bytes.hex(" ").upper()
+    return hex_str.replace("00", '\0') if b"\0" in bytes else hex_str
+
+def write_log_section(log, log_data):
+    # Formatting happens here, after the read, never inside read_until()
+    visible_bytes = make_visible(log_data)
+    write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes(log_data)}")
+    return visible_bytes
 
 def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
     global t_ok_old
@@ -112,20 +116,20 @@ def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
     if not cmd.endswith(TX_NEWLINE): cmd += TX_NEWLINE
     cmd_b = cmd.encode("ascii", errors="ignore")
     
-    # Flush any stale bytes before sending a command.
-    sleep(0.05)
+    # Flush any stale bytes before sending a command. The previous read ended on an
+    # idle gap, so nothing is in flight and no settle sleep is needed.
     ser.reset_input_buffer()
 
     ser.write(cmd_b)
     sleep(delay)
 
-    log_data, visible_bytes, hex_bytes, t_first, t_last, t_found = read_until(ser)
-    
+    log_data, t_first, t_last, t_found = read_until(ser)
+
+    visible_bytes = write_log_section(log, log_data)
+
     if not visible_bytes:
         print('Warning: No visible bytes received')
 
-    write_log_section(log, log_data, visible_bytes, hex_bytes)
-
     # Capture timestamp for the first OK at OLD baud (response to STBR ...)
     if cmd.upper().startswith('STBR ') and (b'OK\r' in log_data) and (t_last is not None):
         t_ok_old = t_last
@@ -139,39 +143,46 @@ def main():
         LOG_FILE = f"{splitext(basename(__file__))[0]}{file if file else ''}.txt"
         baud = STARTING_BAUD
         try:
-            with open(LOG_FILE, "w", encoding="utf-8") as log:
+            with buffered_log(LOG_FILE) as log:
                 write_log(log, f"=== SEQUENCE TEST ===\nStarted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 print(f"Log file: {abspath(LOG_FILE)}")
                 
-                num = 0            
-                while num < len(SEQUENCE):
-                    print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
-                    write_log(log, f"\nStarted: Baud = {baud}")
-                    
-                    with Serial(PORT, baudrate=baud, timeout=0) as port:
+                num = 0
+                print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
+                # Open once and switch baud in place (as stbr_fast_switch does): a close and
+                # reopen costs tens of ms on Windows and lands inside the T1/T2 window.
+                with open_port(PORT, baud, READ_TIMEOUT_SEC) as port:
+                    while num < len(SEQUENCE):
+                        write_log(log, f"\nStarted: Baud = {baud}")
+                        if port.baudrate != baud:
+                            print(f"\nSwitching PORT = {PORT} to Baud = {baud} …")
+                            port.baudrate = baud
+                            port.reset_input_buffer()
+
                         if STARTING_BAUD != baud:
                             # We are at NEW baud after STBR. Measure:
                             #   T1: time from old-baud 'OK<CR>' (after STBR) to banner 'STN2120 v5.6.5<CR>'
                             #   T2: time from ACK byte (<CR>) to prompt 'OK<CR><CR>>'
-                            log_data, visible_bytes, hex_bytes, t_first, t_last, t_found = read_until(
+                            log_data, t_first, t_last, t_found = read_until(
                                 port, TIMEOUT, command=BANNER
                             )
-                            print('Received: ', visible_bytes)
-                            write_log_section(log, log_data, visible_bytes, hex_bytes)
 
                             if BANNER in log_data:
                                 t_banner = t_found if t_found is not None else t_last
 
                                 # Send ACK immediately: EXACTLY one 0x0D byte, no extra CR appended.
-                                write_log(log, "\n--- [ACK] <CR> ---")
-                                t_ack_tx = monotonic()
+                                t_ack_tx = perf_counter_ns()
                                 port.write(b"\r")
 
                                 # Wait for prompt OK<CR><CR>> and timestamp when it appears<CR><CR>> and timestamp when it appears
-                                log_data2, visible_bytes2, hex_bytes2, tf2, tl2, tfound2 = read_until(
+                                log_data2, tf2, tl2, tfound2 = read_until(
                                     port, TIMEOUT, command=PROMPT
                                 )
-                                write_log_section(log, log_data2, visible_bytes2, hex_bytes2)
+
+                                # Log banner/ACK/prompt only after the timed handshake is over
+                                print('Received: ', write_log_section(log, log_data))
+                                write_log(log, "\n--- [ACK] <CR> ---")
+                                write_log_section(log, log_data2)
 
                                 t_prompt = None
                                 if PROMPT in log_data2:
@@ -179,31 +190,33 @@ def main():
 
                                 # Compute T1 / T2
                                 if (t_ok_old is not None) and (t_banner is not None):
-                                    T1_ms = (t_banner - t_ok_old) * 1000.0
+                                    T1_ms = (t_banner - t_ok_old) / 1e6
                                     print(f"T1 (old OK -> banner) = {T1_ms:.3f} ms")
                                     write_log(log, f"\nT1 (old OK -> banner) = {T1_ms:.3f} ms")
 
                                 if (t_ack_tx is not None) and (t_prompt is not None):
-                                    T2_ms = (t_prompt - t_ack_tx) * 1000.0
+                                    T2_ms = (t_prompt - t_ack_tx) / 1e6
                                     print(f"T2 (ack -> OK\\r\\r>) = {T2_ms:.3f} ms")
                                     write_log(log, f"T2 (ack -> OK\\r\\r>) = {T2_ms:.3f} ms")
 
                                 # After successful handshake, continue with sequence
                                 # SEQUENCE = [('', 0)] + SEQUENCE
                             else:
+                                print('Received: ', write_log_section(log, log_data))
                                 baud = STARTING_BAUD
                                 continue
                         
                         seq = SEQUENCE[num:]
                         for cmd, delay in seq:
                             num = send_and_log(port, cmd, delay, log, num)
-                            if cmd.upper().__contains__('STBRT'):
-                                TIMEOUT = int([x for x in cmd.split() if x.isdigit()][0])*1.2
-                            elif cmd.upper().__contains__('STBR '):
+                            upper = cmd.upper()
+                            if 'STBRT' in upper:
+                                TIMEOUT = num_arg(cmd)*1.2
+                            elif 'STBR ' in upper:
                                 STARTING_BAUD = baud
-                                baud = int([x for x in cmd.split() if x.isdigit()][0])
+                                baud = num_arg(cmd)
                                 break
-                            elif cmd.upper().__contains__('STRSTNVM') and (baud != 9600):
+                            elif 'STRSTNVM' in upper and (baud != 9600):
                                 STARTING_BAUD = baud = 9600
                                 TIMEOUT = 1
                                 break
@@ -216,4 +229,8 @@ def main():
 
 # ===== ENTRYPOINT =====
 if __name__ == "__main__":
-    main()
+    begin_timing()
+    try:
+        main()
+    finally:
+        end_timing()
@@ -8,7 +8,7 @@ TX_NEWLINE          = "\r"
 STSBR_GUARD_SEC     = 0.005   # 10ms guard time before switching PC baud
 STSBR_OLD_READ_SEC  = 0.020   # 20ms optional sniff at old baud (set 0 to disable)
 IDLE_GAP_SEC        = 0.3                       # stop reading after this much quiet time
-READ_SLICE_SLEEP    = 0.04                      # check serial port for new data after this much time
+READ_TIMEOUT_SEC    = 0.001                     # default read slice; read_until() uses the idle gap as its timeout
 BASE_DELAY          = 1
 STRSTNVM_DELAY      = 3
 ATZ_DELAY           = 2
@@ -28,52 +28,59 @@ SEQUENCE = [
 ]
 
 from serial     import Serial
-from time       import sleep, time
+from time       import sleep
 from datetime   import datetime
 from os.path    import abspath, basename, splitext
+from serial_timing import begin_timing, buffered_log, end_timing, num_arg, open_port
 
 # ===== HELPERS =====
 def write_log(f, text:str):
-    f.write(text + ("\n" if not text.endswith("\n") else ""))
+    f.write(text + "\n")
+
+# Byte -> text lookup table, built once at import
+_VIS = [f"\\x{x:02X}" for x in range(256)]
+for x in range(0x21, 0x7F):
+    _VIS[x] = chr(x)
+_VIS[0x20] = "·"
+_VIS[0xd]  = "<CR>"
+_VIS[0xa]  = "<LF>\n"
+_VIS[0x9]  = "<TAB>"
     
 def read_until(ser:Serial, delay:float=IDLE_GAP_SEC, command=None):
-    # Keep reading until the device is quiet for IDLE_GAP_SEC.
-    buf = bytearray()
-    last_rx = time()
+    # Keep reading until the device is quiet for IDLE_GAP_SEC, or stop as soon as `command` shows up.
+    chunks = []       # joined once at the end
+    tail = b""        # last len(command)-1 bytes, to catch a match split across reads
+    _read = ser.read  # bound once, outside the loop
+    ser.timeout = delay  # read(1) wakes on the first byte, or returns empty after `delay` of silence
     while True:
-        n = ser.in_waiting
-        if n:
-            buf += ser.read(n)
-            last_rx = time()
-            sleep(READ_SLICE_SLEEP)
-        elif (time() - last_rx) >= delay:
+        chunk = _read(1)
+        if not chunk:
             break
-        else:
-            if command:
-                if command in buf: break
-            sleep(READ_SLICE_SLEEP)
-    log_data = bytes(buf)
-    
-    hex_bytes = " ".join(f"{x:02X}" if x else '\0' for x in log_data)
-    visible_bytes = make_visible(log_data)
-
-    return log_data, visible_bytes, hex_bytes
+        chunk += _read(ser.in_waiting)
+        chunks.append(chunk)
+        if command:
+            window = tail + chunk
+            if command in window:
+                break  # no extra read slice after the match
+            tail = window[max(0, len(window) - len(command) + 1):]
+    ser.timeout = READ_TIMEOUT_SEC
+    return b"".join(chunks)
 
 def make_visible(bytes):
-    chars = []
-    for x in bytes:
-        if not x: break
-        if   x == 0x20:         chars.append("·")
-        elif x == 0xd:          chars.append("<CR>")
-        elif x == 0xa:          chars.append("<LF>\n")
-        elif x == 0x9:          chars.append("<TAB>")
-        elif 0x21 <= x <= 0x7E: chars.append(chr(x))
-        else:                   chars.append(f"\\x{x:02X}")
-    visible_bytes = "".join(chars)
+    # Stop at the first NUL, as before
+    visible_bytes = "".join([_VIS[x] for x in bytes.split(b"\0", 1)[0]])
     return visible_bytes
 
-def write_log_section(log, log_data, visible_bytes, hex_bytes):
-    write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes}")
+def hex_bytes(bytes):
+    hex_str = bytes.hex(" ").upper()
+    return hex_str.replace("00", '\0') if b"\0" in bytes else hex_str
+
+def write_log_section(log, log_data, visible_bytes=None):
+    # Formatting happens here, after the read, never inside read_until()
+    if visible_bytes is None:
+        visible_bytes = make_visible(log_data)
+    write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes(log_data)}")
+    return visible_bytes
 
 
 def send_stsbr_and_switch_baud(ser: Serial, cmd: str, log, num: int):
@@ -86,8 +93,7 @@ def send_stsbr_and_switch_baud(ser: Serial, cmd: str, log, num: int):
     print(f"[{num}] {visible} (FAST BAUD SWITCH)")
 
     # Parse target baud from e.g. "STSBR 115200"
-    parts = cmd.split()
-    new_baud = int([x for x in parts if x.isdigit()][0])
+    new_baud = num_arg(cmd)
 
     full_cmd = (cmd + TX_NEWLINE).encode("ascii", errors="ignore")
 
@@ -96,11 +102,9 @@ def send_stsbr_and_switch_baud(ser: Serial, cmd: str, log, num: int):
     ser.write(full_cmd)
 
     # Optional short read at old baud (often empty / garbage after device switches)
+    old_data, old_baud = b"", ser.baudrate
     if STSBR_OLD_READ_SEC and STSBR_OLD_READ_SEC > 0:
-        old_data, old_vis, old_hex = read_until(ser, delay=STSBR_OLD_READ_SEC)
-        if old_vis:
-            write_log(log, f"\n[pre-switch @ old baud {ser.baudrate}]")
-            write_log_section(log, old_data, old_vis, old_hex)
+        old_data = read_until(ser, delay=STSBR_OLD_READ_SEC)
 
     # Small guard time then switch PC baud quickly
     sleep(STSBR_GUARD_SEC)
@@ -110,13 +114,19 @@ def send_stsbr_and_switch_baud(ser: Serial, cmd: str, log, num: int):
     ser.reset_input_buffer()
 
     # Read response at NEW baud (idle-gap based)
-    log_data, visible_bytes, hex_bytes = read_until(ser, delay=IDLE_GAP_SEC)
+    log_data = read_until(ser, delay=IDLE_GAP_SEC)
 
-    if not visible_bytes:
-        print("Warning: No visible bytes received after baud switch")
+    # Log both phases only now, so formatting never delays the baud switch
+    old_vis = make_visible(old_data)
+    if old_vis:
+        write_log(log, f"\n[pre-switch @ old baud {old_baud}]")
+        write_log_section(log, old_data, old_vis)
 
     write_log(log, f"\n[post-switch @ new baud {new_baud}]")
-    write_log_section(log, log_data, visible_bytes, hex_bytes)
+    visible_bytes = write_log_section(log, log_data)
+
+    if not visible_bytes:
+        print("Warning: No visible bytes received after baud switch")
 
     return num + 1, new_baud
 
@@ -141,13 +151,13 @@ def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
     ser.write(cmd_b)
     sleep(delay)
 
-    log_data, visible_bytes, hex_bytes = read_until(ser)
+    log_data = read_until(ser)
+
+    visible_bytes = write_log_section(log, log_data)
 
     if not visible_bytes:
         print('Warning: No visible bytes received')
 
-    write_log_section(log, log_data, visible_bytes, hex_bytes)
-
     return num + 1
 
 # ===== MAIN =====
@@ -157,7 +167,7 @@ def main():
         LOG_FILE = f"{splitext(basename(__file__))[0]}{file if file else ''}.txt"
         baud = STARTING_BAUD
         try:
-            with open(LOG_FILE, "w", encoding="utf-8") as log:
+            with buffered_log(LOG_FILE) as log:
                 write_log(log, f"=== SEQUENCE TEST ===\nStarted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 print(f"Log file: {abspath(LOG_FILE)}")
                 
@@ -166,11 +176,10 @@ def main():
                     print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
                     write_log(log, f"\nStarted: Baud = {baud}")
                     
-                    with Serial(PORT, baudrate=baud, timeout=0) as port:
+                    with open_port(PORT, baud, READ_TIMEOUT_SEC) as port:
                         if STARTING_BAUD != baud:
-                            log_data, visible_bytes, hex_bytes = read_until(port, TIMEOUT, COMMAND_TO_RECEIVE)
-                            print('Received: ', visible_bytes)
-                            write_log_section(log, log_data, visible_bytes, hex_bytes)
+                            log_data = read_until(port, TIMEOUT, COMMAND_TO_RECEIVE)
+                            print('Received: ', write_log_section(log, log_data))
                             if COMMAND_TO_RECEIVE in log_data:
                                 print(f'"{COMMAND_TO_RECEIVE}" successfully received within {TIMEOUT} s.')
                             #else:
@@ -180,14 +189,15 @@ def main():
                         seq = SEQUENCE[num:]
                         for cmd, delay in seq:
                             num = send_and_log(port, cmd, delay, log, num)
-                            if cmd.upper().__contains__('STBRT'):
-                                TIMEOUT = int([x for x in cmd.split() if x.isdigit()][0])*1.2
-                            elif cmd.upper().__contains__('STSBR '):
+                            upper = cmd.upper()
+                            if 'STBRT' in upper:
+                                TIMEOUT = num_arg(cmd)*1.2
+                            elif 'STSBR ' in upper:
                                 STARTING_BAUD = baud
-                                baud = int([x for x in cmd.split() if x.isdigit()][0])
+                                baud = num_arg(cmd)
                                 # Port baud is switched live inside send_and_log(); keep going without reopen.
                                 continue
-                            elif cmd.upper().__contains__('STRSTNVM') and (baud != 9600):
+                            elif 'STRSTNVM' in upper and (baud != 9600):
                                 STARTING_BAUD = baud = 9600
                                 TIMEOUT = 1
                                 break
@@ -200,4 +210,8 @@ def main():
 
 # ===== ENTRYPOINT =====
 if __name__ == "__main__":
-    main()
+    begin_timing()
+    try:
+        main()
+    finally:
+        end_timing()
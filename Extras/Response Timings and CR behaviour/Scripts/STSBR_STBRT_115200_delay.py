@@ -4,10 +4,11 @@ STARTING_BAUD       = 9600
 TX_NEWLINE          = "\r"
 
 IDLE_GAP_SEC        = 0.3                       # stop reading after this much quiet time (non-STSBR)
-READ_SLICE_SLEEP    = 0.02                      # poll interval
 BASE_DELAY          = 1
 STRSTNVM_DELAY      = 3
 ATZ_DELAY           = 2
+RESET_COMMANDS      = ("STRSTNVM", "ATZ")         # reply spans a device reset: listen for the full delay
+MAX_VISIBLE_BYTES   = 4096                      # longer replies are logged as hex only
 
 # STSBR-specific: wait up to this long (from TX) for the '>' prompt
 STSBR_PROMPT_TIMEOUT_SEC = 6.0
@@ -22,54 +23,76 @@ SEQUENCE = [
 ]
 
 from serial     import Serial
-from time       import sleep, time
+from time       import sleep, time, perf_counter_ns
 from datetime   import datetime
 from os.path    import abspath, basename, splitext
+from serial_timing import begin_timing, buffered_log, end_timing, open_port
 
 # ===== HELPERS =====
 def write_log(f, text: str):
     f.write(text + ("\n" if not text.endswith("\n") else ""))
 
-def make_visible(b: bytes) -> str:
-    chars = []
-    for x in b:
-        if not x:
-            break
-        if x == 0x20:
-            chars.append("·")
-        elif x == 0x0D:
-            chars.append("<CR>")
-        elif x == 0x0A:
-            chars.append("<LF>\n")
-        elif x == 0x09:
-            chars.append("<TAB>")
-        elif 0x21 <= x <= 0x7E:
-            chars.append(chr(x))
-        else:
-            chars.append(f"\\x{x:02X}")
-    return "".join(chars)
-
-def read_until_idle(ser: Serial, idle_gap: float = IDLE_GAP_SEC) -> bytes:
+# Byte -> text lookup table, built once at import
+_VIS = [f"\\x{x:02X}" for x in range(256)]
+for x in range(0x21, 0x7F):
+    _VIS[x] = chr(x)
+_VIS[0x20] = "·"
+_VIS[0x0D] = "<CR>"
+_VIS[0x0A] = "<LF>\n"
+_VIS[0x09] = "<TAB>"
+
+def make_visible(b: bytes | bytearray) -> str:
+    # Stop at the first NUL, as before; skip the per-byte pass above MAX_VISIBLE_BYTES
+    b = b.split(b"\0", 1)[0]
+    if len(b) > MAX_VISIBLE_BYTES:
+        return f"[truncated: {len(b)} bytes, hex only]"
+    return "".join([_VIS[x] for x in b])
+
+def prepare_sequence(seq):
+    """
+    Encode each command, render its log form and classify it once, at import.
+    Returns: [(cmd, visible_cmd, cmd_bytes, delay, is_stsbr, stsbr_baud, is_reset), ...]
+    """
+    steps = []
+    for cmd, delay in seq:
+        upper = cmd.strip().upper()
+        steps.append((
+            cmd, make_visible(cmd.encode("utf-8", errors="ignore")),
+            (cmd + TX_NEWLINE).encode("ascii", errors="ignore"), delay,
+            upper.startswith("STSBR"), parse_stsbr_baud(cmd), upper.startswith(RESET_COMMANDS),
+        ))
+    return steps
+
+def read_until_idle(ser: Serial, idle_gap: float = IDLE_GAP_SEC,
+                    first_byte_timeout: float = 0.0, min_wait: float = 0.0) -> bytearray:
     """
     Read until the device is quiet for `idle_gap`.
+    Waits up to `first_byte_timeout` for the reply to start, and keeps listening for at
+    least `min_wait` from the call (replies that span a device reset have long gaps).
     """
     buf = bytearray()
-    last_rx = time()
+    prev_timeout = ser.timeout
+    t_min_end = perf_counter_ns() + int(min_wait * 1e9)
+    ser.timeout = max(first_byte_timeout, idle_gap)  # the reply may take a while to start
     while True:
-        n = ser.in_waiting
-        if n:
-            buf += ser.read(n)
-            last_rx = time()
-        else:
-            if (time() - last_rx) >= idle_gap:
+        chunk = ser.read(1)
+        if not chunk:
+            left = t_min_end - perf_counter_ns()
+            if left <= 0:
                 break
-            sleep(READ_SLICE_SLEEP)
-    return bytes(buf)
+            ser.timeout = left / 1e9  # still inside min_wait: keep listening
+            continue
+        buf.extend(chunk)
+        buf.extend(ser.read(ser.in_waiting))
+        ser.timeout = idle_gap  # read(1) returns on the next byte, or empty once the line is quiet for idle_gap
+    ser.timeout = prev_timeout
+    return buf
+
+def format_section(log_data: bytes | bytearray) -> str:
+    return f"len={len(log_data)}\n{make_visible(log_data)}\nHEX: {log_data.hex(' ').upper()}"
 
-def write_log_section(log, log_data: bytes):
-    visible_bytes = make_visible(log_data)
-    hex_bytes = " ".join(f"{x:02X}" for x in log_data)
-    write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes}")
+def write_log_section(log, log_data: bytes | bytearray):
+    write_log(log, format_section(log_data))
 
 def parse_stsbr_baud(cmd: str) -> int | None:
     """
@@ -84,7 +107,7 @@ def parse_stsbr_baud(cmd: str) -> int | None:
             return None
     return None
 
-def read_stsbr_with_baud_switch(ser: Serial, t_tx: float, new_baud: int, timeout_sec: float = STSBR_PROMPT_TIMEOUT_SEC):
+def read_stsbr_with_baud_switch(ser: Serial, t_tx: int, new_baud: int, timeout_sec: float = STSBR_PROMPT_TIMEOUT_SEC):
     """
     STSBR behavior (as you described):
       - At current baud, device replies: ... 'OK' then first '\\r'
@@ -102,10 +125,10 @@ def read_stsbr_with_baud_switch(ser: Serial, t_tx: float, new_baud: int, timeout
          Any '\\r' bytes in-between are ignored naturally because we search for '>' after OK.
 
     Returns:
-      data_all: bytes captured (old + new baud phases, concatenated)
-      ok_time: timestamp when OK detected
-      prompt_time: timestamp when '>' detected (may be None if timeout)
-      cr1_time: timestamp when first CR after OK detected (may be None)
+      data_all: bytearray captured (old + new baud phases, concatenated)
+      ok_time: perf_counter_ns when OK detected
+      prompt_time: perf_counter_ns when '>' detected (may be None if timeout)
+      cr1_time: perf_counter_ns when first CR after OK detected (may be None)
     """
     buf_old = bytearray()
     buf_new = bytearray()
@@ -116,34 +139,35 @@ def read_stsbr_with_baud_switch(ser: Serial, t_tx: float, new_baud: int, timeout
 
     ok_pos_end = 0  # index after 'OK' in buf_old; used to search for CR after OK
 
-    deadline = t_tx + float(timeout_sec)
+    deadline = t_tx + int(float(timeout_sec) * 1e9)  # perf_counter_ns
+    prev_timeout = ser.timeout
 
     # ---- Phase 1: old baud, wait for OK and first CR after OK ----
     while True:
-        now = time()
+        now = perf_counter_ns()
         if now >= deadline:
             break
 
-        n = ser.in_waiting
-        if n:
-            chunk = ser.read(n)
+        ser.timeout = (deadline - now) / 1e9
+        chunk = ser.read(1)
+        if chunk:
+            chunk += ser.read(ser.in_waiting)
+            scan_from = max(0, len(buf_old) - 1)  # -1 catches an 'O' at the end of the previous chunk
             buf_old += chunk
 
             if ok_time is None:
-                p_ok = buf_old.find(b"OK")
+                p_ok = buf_old.find(b"OK", scan_from)
                 if p_ok != -1:
-                    ok_time = time()
+                    ok_time = perf_counter_ns()
                     ok_pos_end = p_ok + 2  # after OK
 
             if ok_time is not None and cr1_time is None:
-                p_cr = buf_old.find(b"\r", ok_pos_end)
+                p_cr = buf_old.find(b"\r", max(ok_pos_end, scan_from))
                 if p_cr != -1:
-                    cr1_time = time()
+                    cr1_time = perf_counter_ns()
                     # As soon as we have the first CR after OK, switch baud.
                     break
 
-        sleep(READ_SLICE_SLEEP)
-
     # Switch baud only if we reached CR1 (your requirement)
     if cr1_time is not None:
         try:
@@ -162,50 +186,48 @@ def read_stsbr_with_baud_switch(ser: Serial, t_tx: float, new_baud: int, timeout
 
     # ---- Phase 2: new baud, wait for '>' ----
     while True:
-        now = time()
+        now = perf_counter_ns()
         if now >= deadline:
             break
 
-        n = ser.in_waiting
-        if n:
-            chunk = ser.read(n)
+        ser.timeout = (deadline - now) / 1e9
+        chunk = ser.read(1)
+        if chunk:
+            chunk += ser.read(ser.in_waiting)
             buf_new += chunk
 
-            if b">" in buf_new:
-                prompt_time = time()
+            if b">" in chunk:  # 1 byte: only the new chunk can hold it
+                prompt_time = perf_counter_ns()
                 break
 
-        sleep(READ_SLICE_SLEEP)
-
-    data_all = bytes(buf_old) + bytes(buf_new)
+    ser.timeout = prev_timeout
+    buf_old += buf_new  # one copy of the new-baud tail instead of two full bytes() copies
+    data_all = buf_old
     return data_all, ok_time, prompt_time, cr1_time
 
 # ===== CORE =====
-def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
+def send_and_log(ser: Serial, step: tuple, log, num: int):
     """
     Sends one command, logs response.
     Returns: (next_num, updated_baud_or_None)
     """
-    visible_cmd = make_visible(cmd.encode("utf-8", errors="ignore"))
+    cmd, visible_cmd, cmd_to_send, delay, is_stsbr, new_baud, is_reset = step  # from prepare_sequence()
     write_log(log, f"\n--- [{num}] {visible_cmd} ---")
     print(f"[{num}] {visible_cmd}")
 
-    cmd_to_send = (cmd + TX_NEWLINE).encode("ascii", errors="ignore")
-
     sleep(0.05)
     ser.reset_input_buffer()
 
-    # TX timestamp
-    t_tx = time()
+    # TX timestamp: perf_counter_ns for the T1/T2 deltas, wall clock for the log only
+    t_tx_wall = time()
+    t_tx = perf_counter_ns()
     ser.write(cmd_to_send)
 
     # SPECIAL: STSBR with baud switch handling
-    if cmd.strip().upper().startswith("STSBR"):
-        new_baud = parse_stsbr_baud(cmd)
+    if is_stsbr:
         if new_baud is None:
             write_log(log, "ERROR: Could not parse baud from STSBR command.")
-            sleep(delay)
-            data = read_until_idle(ser, idle_gap=IDLE_GAP_SEC)
+            data = read_until_idle(ser, idle_gap=IDLE_GAP_SEC, first_byte_timeout=delay)
             write_log_section(log, data)
             return num + 1, None
 
@@ -216,59 +238,59 @@ def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
             timeout_sec=STSBR_PROMPT_TIMEOUT_SEC
         )
 
-        write_log(log, f"TX time: {t_tx:.6f}")
+        # Collect the timing lines and the RX section and write them in one go
+        lines = [f"TX time: {t_tx_wall:.6f}"]
 
         if ok_t is not None:
-            t1_ms = (ok_t - t_tx) * 1000.0
-            write_log(log, f"T1 (TX -> OK): {t1_ms:.3f} ms")
+            t1_ms = (ok_t - t_tx) / 1e6
+            lines.append(f"T1 (TX -> OK): {t1_ms:.3f} ms")
         else:
-            write_log(log, "OK not received (cannot compute T1/T2)")
+            lines.append("OK not received (cannot compute T1/T2)")
 
         if cr1_t is not None:
-            cr1_ms = (cr1_t - t_tx) * 1000.0
-            write_log(log, f"CR1 after OK seen at: {cr1_ms:.3f} ms (then host baud -> {new_baud})")
+            cr1_ms = (cr1_t - t_tx) / 1e6
+            lines.append(f"CR1 after OK seen at: {cr1_ms:.3f} ms (then host baud -> {new_baud})")
         else:
-            write_log(log, f"First CR after OK not seen before timeout; host baud not switched to {new_baud}")
+            lines.append(f"First CR after OK not seen before timeout; host baud not switched to {new_baud}")
 
         if ok_t is not None and prompt_t is not None:
-            t2_ms = (prompt_t - ok_t) * 1000.0
-            write_log(log, f"T2 (OK -> '>'): {t2_ms:.3f} ms")
+            t2_ms = (prompt_t - ok_t) / 1e6
+            lines.append(f"T2 (OK -> '>'): {t2_ms:.3f} ms")
         elif ok_t is not None and prompt_t is None:
-            write_log(log, f"Prompt ('>') not received within {STSBR_PROMPT_TIMEOUT_SEC:.1f} s (cannot compute T2)")
+            lines.append(f"Prompt ('>') not received within {STSBR_PROMPT_TIMEOUT_SEC:.1f} s (cannot compute T2)")
 
-        write_log_section(log, data)
+        lines.append(format_section(data))
+        write_log(log, "\n".join(lines))
 
         # Keep terminal baud at the new baud for subsequent commands
         return num + 1, new_baud
 
-    # NORMAL PATH
-    sleep(delay)
-    data = read_until_idle(ser, idle_gap=IDLE_GAP_SEC)
+    # NORMAL PATH: read right away; `delay` only bounds the wait for the first byte
+    min_wait = delay if is_reset else 0.0
+    data = read_until_idle(ser, idle_gap=IDLE_GAP_SEC, first_byte_timeout=delay, min_wait=min_wait)
     write_log_section(log, data)
     return num + 1, None
 
+STEPS = prepare_sequence(SEQUENCE)
+
 # ===== MAIN =====
 def main():
     LOG_FILE = f"{splitext(basename(__file__))[0]}.txt"
     baud = STARTING_BAUD
 
     try:
-        with open(LOG_FILE, "w", encoding="utf-8") as log:
+        with buffered_log(LOG_FILE) as log:
             write_log(log, "=== SEQUENCE TEST ===")
             write_log(log, f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"Log file: {abspath(LOG_FILE)}")
 
             num = 0
-            while num < len(SEQUENCE):
-                print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
+            print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
+            # Open once: the STSBR step switches the port's baud in place, mid-reply
+            with open_port(PORT, baud, timeout=0) as port:
                 write_log(log, f"\nStarted: Baud = {baud}")
-
-                with Serial(PORT, baudrate=baud, timeout=0) as port:
-                    seq = SEQUENCE[num:]
-                    for cmd, delay in seq:
-                        num, maybe_new_baud = send_and_log(port, cmd, delay, log, num)
-                        if maybe_new_baud is not None:
-                            baud = maybe_new_baud  # keep for future opens as well
+                for step in STEPS:
+                    num, _ = send_and_log(port, step, log, num)
 
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -278,4 +300,8 @@ def main():
 
 # ===== ENTRYPOINT =====
 if __name__ == "__main__":
-    main()
+    begin_timing()
+    try:
+        main()
+    finally:
+        end_timing()
\ No newline at end of file
@@ -4,10 +4,11 @@ STARTING_BAUD       = 9600
 TX_NEWLINE          = "\r"
 
 IDLE_GAP_SEC        = 0.3                       # stop reading after this much quiet time (non-STSBR)
-READ_SLICE_SLEEP    = 0.02                      # poll interval
 BASE_DELAY          = 1
 STRSTNVM_DELAY      = 3
 ATZ_DELAY           = 2
+RESET_COMMANDS      = ("STRSTNVM", "ATZ")         # reply spans a device reset: listen for the full delay
+MAX_VISIBLE_BYTES   = 4096                      # longer replies are logged as hex only
 
 # STSBR-specific: wait up to this long for the '>' prompt after OK
 STSBR_PROMPT_TIMEOUT_SEC = 6.0
@@ -26,61 +27,87 @@ SEQUENCE = [
 ]
 
 from serial     import Serial
-from time       import sleep, time
+from time       import sleep, time, perf_counter_ns
 from datetime   import datetime
 from os.path    import abspath, basename, splitext
+from serial_timing import begin_timing, buffered_log, end_timing, open_port
 
 # ===== HELPERS =====
 def write_log(f, text: str):
     f.write(text + ("\n" if not text.endswith("\n") else ""))
 
-def make_visible(b: bytes) -> str:
-    chars = []
-    for x in b:
-        if not x:
-            break
-        if x == 0x20:
-            chars.append("·")
-        elif x == 0x0D:
-            chars.append("<CR>")
-        elif x == 0x0A:
-            chars.append("<LF>\n")
-        elif x == 0x09:
-            chars.append("<TAB>")
-        elif 0x21 <= x <= 0x7E:
-            chars.append(chr(x))
-        else:
-            chars.append(f"\\x{x:02X}")
-    return "".join(chars)
-
-def read_until(ser: Serial, idle_gap: float = IDLE_GAP_SEC, command: bytes | None = None):
+# Byte -> text lookup table, built once at import
+_VIS = [f"\\x{x:02X}" for x in range(256)]
+for x in range(0x21, 0x7F):
+    _VIS[x] = chr(x)
+_VIS[0x20] = "·"
+_VIS[0x0D] = "<CR>"
+_VIS[0x0A] = "<LF>\n"
+_VIS[0x09] = "<TAB>"
+
+def make_visible(b: bytes | bytearray) -> str:
+    # Stop at the first NUL, as before; skip the per-byte pass above MAX_VISIBLE_BYTES
+    b = b.split(b"\0", 1)[0]
+    if len(b) > MAX_VISIBLE_BYTES:
+        return f"[truncated: {len(b)} bytes, hex only]"
+    return "".join([_VIS[x] for x in b])
+
+def prepare_sequence(seq):
+    """
+    Encode each command, render its log form and classify it once, at import.
+    Returns: [(cmd, visible_cmd, cmd_bytes, delay, is_stsbr, is_reset), ...]
+    """
+    steps = []
+    for cmd, delay in seq:
+        upper = cmd.strip().upper()
+        steps.append((
+            cmd, make_visible(cmd.encode("utf-8", errors="ignore")),
+            (cmd + TX_NEWLINE).encode("ascii", errors="ignore"), delay,
+            "STSBR" in upper, upper.startswith(RESET_COMMANDS),
+        ))
+    return steps
+
+def read_until(ser: Serial, idle_gap: float = IDLE_GAP_SEC, command: bytes | None = None,
+               first_byte_timeout: float = 0.0, min_wait: float = 0.0):
     """
     Read until the device is quiet for `idle_gap`, or until `command` appears.
+    Waits up to `first_byte_timeout` for the reply to start, and keeps listening for at
+    least `min_wait` from the call (replies that span a device reset have long gaps).
     """
     buf = bytearray()
-    last_rx = time()
+    prev_timeout = ser.timeout
+    t_min_end = perf_counter_ns() + int(min_wait * 1e9)
+    ser.timeout = max(first_byte_timeout, idle_gap)  # the reply may take a while to start
 
     while True:
-        n = ser.in_waiting
-        if n:
-            buf += ser.read(n)
-            last_rx = time()
-        else:
-            if command is not None and command in buf:
-                break
-            if (time() - last_rx) >= idle_gap:
+        chunk = ser.read(1)
+        if not chunk:
+            left = t_min_end - perf_counter_ns()
+            if left <= 0:
                 break
-            sleep(READ_SLICE_SLEEP)
+            ser.timeout = left / 1e9  # still inside min_wait: keep listening
+            continue
+        buf.extend(chunk)
+        buf.extend(ser.read(ser.in_waiting))
+        if command is not None and command in buf:
+            break
+        ser.timeout = idle_gap  # read(1) returns on the next byte, or empty once the line is quiet for idle_gap
+    ser.timeout = prev_timeout
 
-    log_data = bytes(buf)
-    hex_bytes = " ".join(f"{x:02X}" if x else "\\0" for x in log_data)
+    log_data = buf
+    hex_bytes = log_data.hex(" ").upper()
+    if b"\0" in log_data:
+        hex_bytes = hex_bytes.replace("00", "\\0")
     visible_bytes = make_visible(log_data)
     return log_data, visible_bytes, hex_bytes
 
-def write_log_section(log, log_data: bytes, visible_bytes: str, hex_bytes: str):
-    write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes}")
+def format_section(log_data: bytes | bytearray, visible_bytes: str, hex_bytes: str) -> str:
+    return f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes}"
+
+def write_log_section(log, log_data: bytes | bytearray, visible_bytes: str, hex_bytes: str):
+    write_log(log, format_section(log_data, visible_bytes, hex_bytes))
 
-def read_stsbr_t1_t2(ser: Serial, t_tx: float, prompt_timeout_sec: float = STSBR_PROMPT_TIMEOUT_SEC):
+def read_stsbr_t1_t2(ser: Serial, t_tx: int, prompt_timeout_sec: float = STSBR_PROMPT_TIMEOUT_SEC):
     """
     For STSBR:
       - T1: TX -> first 'OK'
@@ -96,84 +123,86 @@ def read_stsbr_t1_t2(ser: Serial, t_tx: float, prompt_timeout_sec: float = STSBR
     ok_search_from = 0
     prompt_search_from = 0
 
-    deadline = t_tx + float(prompt_timeout_sec)
+    deadline = t_tx + int(float(prompt_timeout_sec) * 1e9)  # perf_counter_ns
+    prev_timeout = ser.timeout
 
     while True:
-        now = time()
+        now = perf_counter_ns()
         if now >= deadline:
             break
 
-        n = ser.in_waiting
-        if n:
-            chunk = ser.read(n)
+        ser.timeout = (deadline - now) / 1e9
+        chunk = ser.read(1)
+        if chunk:
+            chunk += ser.read(ser.in_waiting)
+            ok_search_from = max(ok_search_from, len(buf) - 1)  # -1 catches an 'O' at the end of the previous chunk
             buf += chunk
 
             # Find OK once
             if ok_time is None:
                 p_ok = buf.find(b"OK", ok_search_from)
                 if p_ok != -1:
-                    ok_time = time()
+                    ok_time = perf_counter_ns()
                     prompt_search_from = p_ok + 2  # start searching AFTER 'OK'
 
             # Find '>' only after OK
             if ok_time is not None and prompt_time is None:
                 p_gt = buf.find(b">", prompt_search_from)
                 if p_gt != -1:
-                    prompt_time = time()
+                    prompt_time = perf_counter_ns()
                     break  # Stop as soon as prompt arrives
+                prompt_search_from = len(buf)  # nothing before here can hold the 1-byte '>'
 
-        else:
-            # Keep waiting until timeout (requirement: wait until '>' or 6s max)
-            sleep(READ_SLICE_SLEEP)
-
-    return bytes(buf), ok_time, prompt_time
+    ser.timeout = prev_timeout
+    return buf, ok_time, prompt_time
 
-def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
-    visible_cmd = make_visible(cmd.encode("utf-8", errors="ignore"))
+def send_and_log(ser: Serial, step: tuple, log, num: int):
+    cmd, visible_cmd, cmd_to_send, delay, is_stsbr, is_reset = step  # from prepare_sequence()
     write_log(log, f"\n--- [{num}] {visible_cmd} ---")
     print(f"[{num}] {visible_cmd}")
 
-    cmd_to_send = (cmd + TX_NEWLINE).encode("ascii", errors="ignore")
-
     sleep(0.05)
     ser.reset_input_buffer()
 
-    # TX timestamp
-    t_tx = time()
+    # TX timestamp: perf_counter_ns for the T1/T2 deltas, wall clock for the log only
+    t_tx_wall = time()
+    t_tx = perf_counter_ns()
     ser.write(cmd_to_send)
 
     # SPECIAL: STSBR timing (T1 + T2)
-    if "STSBR" in cmd.upper():
+    if is_stsbr:
         data, ok_t, prompt_t = read_stsbr_t1_t2(
             ser,
             t_tx=t_tx,
             prompt_timeout_sec=STSBR_PROMPT_TIMEOUT_SEC
         )
 
-        write_log(log, f"TX time: {t_tx:.6f}")
+        # Collect the timing lines and the RX section and write them in one go
+        lines = [f"TX time: {t_tx_wall:.6f}"]
 
         if ok_t is not None:
-            t1_ms = (ok_t - t_tx) * 1000.0
-            write_log(log, f"T1 (TX -> OK): {t1_ms:.3f} ms")
+            t1_ms = (ok_t - t_tx) / 1e6
+            lines.append(f"T1 (TX -> OK): {t1_ms:.3f} ms")
         else:
-            write_log(log, "OK not received (cannot compute T1/T2)")
+            lines.append("OK not received (cannot compute T1/T2)")
 
         if ok_t is not None and prompt_t is not None:
-            t2_ms = (prompt_t - ok_t) * 1000.0
-            write_log(log, f"T2 (OK -> '>'): {t2_ms:.3f} ms")
+            t2_ms = (prompt_t - ok_t) / 1e6
+            lines.append(f"T2 (OK -> '>'): {t2_ms:.3f} ms")
         elif ok_t is not None and prompt_t is None:
-            write_log(log, f"Prompt ('>') not received within {STSBR_PROMPT_TIMEOUT_SEC:.1f} s (cannot compute T2)")
+            lines.append(f"Prompt ('>') not received within {STSBR_PROMPT_TIMEOUT_SEC:.1f} s (cannot compute T2)")
 
-        visible_bytes = make_visible(data)
-        hex_bytes = " ".join(f"{x:02X}" for x in data)
-        write_log_section(log, data, visible_bytes, hex_bytes)
+        lines.append(format_section(data, make_visible(data), data.hex(" ").upper()))
+        write_log(log, "\n".join(lines))
 
         # If '>' not received within timeout, move on.
         return num + 1
 
-    # NORMAL PATH
-    sleep(delay)
-    log_data, visible_bytes, hex_bytes = read_until(ser, idle_gap=IDLE_GAP_SEC)
+    # NORMAL PATH: read right away; `delay` only bounds the wait for the first byte
+    min_wait = delay if is_reset else 0.0
+    log_data, visible_bytes, hex_bytes = read_until(
+        ser, idle_gap=IDLE_GAP_SEC, first_byte_timeout=delay, min_wait=min_wait
+    )
 
     if not visible_bytes:
         print("Warning: No visible bytes received")
@@ -181,6 +210,8 @@ def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
     write_log_section(log, log_data, visible_bytes, hex_bytes)
     return num + 1
 
+STEPS = prepare_sequence(SEQUENCE)
+
 # ===== MAIN =====
 def main():
     for file in range(1):
@@ -188,20 +219,18 @@ def main():
         baud = STARTING_BAUD
 
         try:
-            with open(LOG_FILE, "w", encoding="utf-8") as log:
+            with buffered_log(LOG_FILE) as log:
                 write_log(log, "=== SEQUENCE TEST ===")
                 write_log(log, f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 print(f"Log file: {abspath(LOG_FILE)}")
 
                 num = 0
-                while num < len(SEQUENCE):
-                    print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
+                print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
+                # The whole sequence runs at STARTING_BAUD: one open, one pass over STEPS
+                with open_port(PORT, baud, timeout=0) as port:
                     write_log(log, f"\nStarted: Baud = {baud}")
-
-                    with Serial(PORT, baudrate=baud, timeout=0) as port:
-                        seq = SEQUENCE[num:]
-                        for cmd, delay in seq:
-                            num = send_and_log(port, cmd, delay, log, num)
+                    for step in STEPS:
+                        num = send_and_log(port, step, log, num)
 
         except Exception as e:
             print(f"❌ Error: {e}")
@@ -211,4 +240,8 @@ def main():
 
 # ===== ENTRYPOINT =====
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    begin_timing()
+    try:
+        main()
+    finally:
+        end_timing()
\ No newline at end of file
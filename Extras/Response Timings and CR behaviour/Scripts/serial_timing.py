@@ -0,0 +1,312 @@
+import argparse, io, os, re, sys, time, ctypes, serial
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import win_precise_time as wpt  # GetSystemTimePreciseAsFileTime on Windows
+except ImportError:
+    wpt = time
+
+# ===== CONFIG =====
+PORT = "COM8"
+BAUD = 9600
+TX_NEWLINE = b"\r"
+
+READ_TIMEOUT_SEC = 0.001  # default read slice (drain); the capture loop sets its own timeout
+DRAIN_MAX_SEC = 0.05  # upper bound for flushing stale RX before TX
+
+HIGH_PRIORITY_CLASS = 0x00000080
+TIMING_CPU = 1  # core the process is pinned to during the run
+RT_PRIORITY = 10  # SCHED_FIFO priority on Linux (needs root or CAP_SYS_NICE)
+
+FTDI_LATENCY_MS = 1  # USB latency timer for FTDI adapters (driver default 16 ms)
+# Opt-in (set STN_FTDI_LATENCY=1): rewrites the adapter's LatencyTimer in HKLM, which persists
+# and only takes effect once the adapter is re-plugged
+SET_FTDI_LATENCY = os.environ.get("STN_FTDI_LATENCY") == "1"
+TIOCGSERIAL, TIOCSSERIAL, ASYNC_LOW_LATENCY = 0x541E, 0x541F, 0x2000
+
+# ===== Helpers =====
+def now_str():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+# Numeric argument of a command ("STBR 115200", "STBRT 1"): the first all-digit token
+_NUM = re.compile(r"(?<!\S)\d+(?!\S)")
+
+def num_arg(cmd: str) -> int:
+    return int(_NUM.search(cmd).group())
+
+# Byte -> text lookup tables, built once at import
+_VIS = [f"\\x{x:02X}" for x in range(256)]
+for x in range(0x21, 0x7F):
+    _VIS[x] = chr(x)
+_VIS[0x20] = "·"
+_VIS[0x09] = "<TAB>"
+_VIS[0x0D] = "<CR>"
+_VIS[0x0A] = "<LF>\n"
+
+# STRSTNVM flavour: TAB/VT/FF as hex, CR/LF as above
+_VIS_CTRL_HEX = list(_VIS)
+for x in (0x09, 0x0B, 0x0C):
+    _VIS_CTRL_HEX[x] = f"<0x{x:02X}>"
+
+def visible_bytes(b: bytes, table=_VIS) -> str:
+    return "".join([table[x] for x in b])
+
+def hex_bytes(b: bytes) -> str:
+    return b.hex(" ").upper()
+
+def write_log(f, text: str):
+    f.write(text + ("\n" if not text.endswith("\n") else ""))
+
+@contextmanager
+def buffered_log(path):
+    """Collect the log in memory and write it to `path` in one go when the run ends."""
+    buf = io.StringIO()
+    try:
+        yield buf
+    finally:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
+
+def chunk_time(chunk_edges, idx: int) -> int:
+    """Timestamp of the RX chunk that delivered byte `idx` (chunk_edges = [(end_index, t), ...])."""
+    return next(t for end, t in chunk_edges if idx < end)
+
+def begin_timing():
+    """
+    Raise scheduling for the run and pin it to TIMING_CPU: HIGH priority plus 1 ms timer
+    resolution on Windows, SCHED_FIFO on Linux. Silently skipped without the rights.
+    """
+    if sys.platform == "win32":
+        ctypes.windll.winmm.timeBeginPeriod(1)
+        k32 = ctypes.windll.kernel32
+        k32.GetCurrentProcess.restype = ctypes.c_void_p
+        proc = ctypes.c_void_p(k32.GetCurrentProcess())
+        k32.SetPriorityClass(proc, HIGH_PRIORITY_CLASS)
+        k32.SetProcessAffinityMask(proc, ctypes.c_size_t(1 << TIMING_CPU))
+    elif sys.platform.startswith("linux"):
+        try:
+            os.sched_setaffinity(0, {TIMING_CPU})
+        except OSError:
+            pass
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(RT_PRIORITY))
+        except OSError:
+            pass  # unprivileged run: stay on the default scheduler
+
+def end_timing():
+    if sys.platform == "win32":
+        ctypes.windll.winmm.timeEndPeriod(1)
+
+def ftdi_latency_timer(port_name: str, ms: int = FTDI_LATENCY_MS):
+    """
+    Windows FTDI VCP: set the adapter's USB LatencyTimer (driver default 16 ms) in the
+    registry before the port is opened. Needs admin rights; silently skipped otherwise.
+    Prints when a value is changed: the driver reads it when the adapter re-enumerates.
+    """
+    import winreg
+    base = r"SYSTEM\CurrentControlSet\Enum\FTDIBUS"
+    try:
+        root = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, base)
+    except OSError:
+        return  # not an FTDI system
+    with root:
+        for i in range(winreg.QueryInfoKey(root)[0]):
+            path = rf"{base}\{winreg.EnumKey(root, i)}\0000\Device Parameters"
+            try:
+                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, path, 0,
+                                    winreg.KEY_QUERY_VALUE | winreg.KEY_SET_VALUE) as key:
+                    if winreg.QueryValueEx(key, "PortName")[0] != port_name:
+                        continue
+                    try:
+                        old = winreg.QueryValueEx(key, "LatencyTimer")[0]
+                    except OSError:
+                        old = None
+                    if old != ms:
+                        winreg.SetValueEx(key, "LatencyTimer", 0, winreg.REG_DWORD, ms)
+                        print(f"FTDI LatencyTimer for {port_name}: {old} -> {ms} ms "
+                              f"(re-plug the adapter for it to take effect)")
+            except OSError:
+                continue
+
+def async_low_latency(ser):
+    """Linux: set ASYNC_LOW_LATENCY on the tty (TIOCGSERIAL/TIOCSSERIAL), as setserial does."""
+    import fcntl
+    buf = bytearray(128)  # >= sizeof(struct serial_struct); flags is the 5th int
+    try:
+        fcntl.ioctl(ser.fileno(), TIOCGSERIAL, buf)
+        flags = int.from_bytes(buf[16:20], sys.byteorder) | ASYNC_LOW_LATENCY
+        buf[16:20] = flags.to_bytes(4, sys.byteorder)
+        fcntl.ioctl(ser.fileno(), TIOCSSERIAL, buf)
+    except OSError:
+        pass  # driver without serial_struct support (e.g. some CDC-ACM)
+
+def open_port(port, baud, timeout=READ_TIMEOUT_SEC):
+    """Open `port` with the adapter's latency floor lowered (ASYNC_LOW_LATENCY; FTDI timer if opted in)."""
+    if sys.platform == "win32" and SET_FTDI_LATENCY:
+        ftdi_latency_timer(port)
+    ser = serial.Serial(port, baudrate=baud, timeout=timeout)
+    if sys.platform.startswith("linux"):
+        async_low_latency(ser)
+    return ser
+
+def drain(ser: serial.Serial):
+    """Discard stale RX; stop after two empty reads in a row or DRAIN_MAX_SEC."""
+    deadline = time.perf_counter() + DRAIN_MAX_SEC
+    quiet = 0
+    while quiet < 2 and time.perf_counter() < deadline:
+        quiet = 0 if ser.read(4096) else quiet + 1
+
+def capture(ser: serial.Serial, patterns, t_deadline: int):
+    """
+    Read until every byte string in `patterns` has been seen, in order, or until
+    `t_deadline` (perf_counter_ns). Each pattern is searched for after the previous match.
+    Returns: (rx_bytes, chunk_edges, matches) with matches = [(start_idx, end_idx), ...]
+    """
+    rx_bytes = bytearray()
+    chunk_edges = []  # (end index, perf_counter_ns) per received chunk
+    matches = []
+    search_from = 0
+
+    _read, _perf = ser.read, time.perf_counter_ns  # bound once, outside the capture loop
+    while len(matches) < len(patterns) and (remaining := t_deadline - _perf()) > 0:
+        # Block until the first byte (driver wakeup, not a poll slice), then take the rest
+        ser.timeout = remaining / 1e9
+        chunk = _read(1)
+        t_now = _perf()
+        if not chunk:
+            break  # timeout
+        chunk += _read(ser.in_waiting)
+
+        prev_len = len(rx_bytes)
+        rx_bytes.extend(chunk)
+        chunk_edges.append((len(rx_bytes), t_now))
+
+        # Only the new bytes (plus len(pat)-1 of overlap) are scanned; for a 1-byte
+        # pattern that is a single memchr over the chunk. One chunk may complete several.
+        while len(matches) < len(patterns):
+            pat = patterns[len(matches)]
+            pos = rx_bytes.find(pat, max(search_from, prev_len - len(pat) + 1))
+            if pos == -1:
+                break
+            matches.append((pos, pos + len(pat) - 1))
+            search_from = pos + len(pat)
+
+    ser.timeout = READ_TIMEOUT_SEC
+    return rx_bytes, chunk_edges, matches
+
+# ===== TEST =====
+def run_test(name: str, tx_cmd: bytes, patterns, timeout: float, result_lines, t1_line: str,
+             not_found: str, intro: str | None = None, vis_table=_VIS):
+    """
+    Send `tx_cmd` and time the response against `patterns` (byte strings, matched in order):
+      - one pattern : T1 = TX -> first byte of the pattern
+      - more        : T1 = last byte of the second-to-last match -> first byte of the last one
+    `intro`, `result_lines`, `t1_line` and `not_found` are the test's own log wording;
+    the result templates get t_tx_wall, m (the matches) and t1 (seconds).
+    The log goes to <name>_T1.txt.
+    """
+    log_file = f"{name}_T1.txt"
+
+    print(f"Opening {PORT} @ {BAUD} …")
+    try:
+        ser = open_port(PORT, BAUD)
+    except Exception as e:
+        print(f"❌ Error opening port: {e}")
+        return
+
+    print(f"Log file: {os.path.abspath(log_file)}")
+
+    with buffered_log(log_file) as log:
+        write_log(log, f"=== {name} T1 TIMING TEST ===")
+        write_log(log, f"Started: {now_str()}")
+        write_log(log, f"PORT = {PORT} @ Baud = {BAUD}\n")
+        if intro:
+            write_log(log, intro)
+
+        drain(ser)
+
+        # Send command; without an intro the PORT line's blank line already separates it
+        tx_text = visible_bytes(tx_cmd, vis_table)
+        write_log(log, f"\nTX: {tx_text}" if intro else f"TX: {tx_text}")
+
+        t_tx_wall = wpt.time()  # epoch, for the log only
+        t_tx = time.perf_counter_ns()
+        ser.write(tx_cmd)
+
+        rx_bytes, chunk_edges, matches = capture(ser, patterns, t_tx + int(timeout * 1e9))
+
+        t1 = None
+        if len(matches) == len(patterns):
+            t_from = t_tx if len(matches) == 1 else chunk_time(chunk_edges, matches[-2][1])
+            t1 = chunk_time(chunk_edges, matches[-1][0]) - t_from
+
+        # ===== LOG OUTPUT =====
+        write_log(log, f"\nRX len = {len(rx_bytes)}")
+        write_log(log, visible_bytes(rx_bytes, vis_table))
+        write_log(log, "\nHEX:")
+        write_log(log, hex_bytes(rx_bytes))
+
+        if t1 is not None:
+            fields = dict(t_tx_wall=t_tx_wall, m=matches, t1=t1 / 1e9)
+            write_log(log, f"\nT1 RESULT:")
+            for line in result_lines:
+                write_log(log, line.format(**fields))
+            write_log(log, t1_line.format(**fields))
+            print(t1_line.format(**fields))
+        else:
+            write_log(log, f"\n❌ T1 NOT FOUND ({not_found})")
+            print(f"❌ T1 not found ({not_found})")
+
+    try:
+        ser.close()
+    except:
+        pass
+
+    print(f"\n✅ Done. Log saved to: {os.path.abspath(log_file)}")
+
+# ===== TESTS =====
+# Log wording is kept as the original per-command scripts wrote it, so T1 logs stay diffable
+TESTS = {
+    # Response: OK\r\r>  -> time to the prompt byte
+    "atd":      dict(name="ATD", tx_cmd=b"ATD" + TX_NEWLINE, patterns=[b">"], timeout=10.0,
+                     intro="Expected RX (example): OK<CR><CR>>",
+                     result_lines=["ATD TX time (epoch): {t_tx_wall:.6f}",
+                                   "Prompt '>' at byte index: {m[0][0]}"],
+                     t1_line="T1 (TX->'>') = {t1:.6f} seconds",
+                     not_found="no '>' prompt or timeout"),
+    # First CR (0x0D) after ATWS
+    "atws":     dict(name="ATWS", tx_cmd=b"ATWS" + TX_NEWLINE, patterns=[b"\r"], timeout=10.0,
+                     intro="T1 definition: time from TX of ATWS<CR> to first RX <CR> (0x0D)",
+                     result_lines=["ATWS TX time (epoch): {t_tx_wall:.6f}",
+                                   "First RX <CR> at byte index: {m[0][0]}"],
+                     t1_line="T1 (TX->first <CR>) = {t1:.6f} seconds",
+                     not_found="no <CR> received or timeout"),
+    # OK\r, then the ELM327 banner once the device has restarted
+    "strstnvm": dict(name="STRSTNVM", tx_cmd=b"STRSTNVM" + TX_NEWLINE,
+                     patterns=[b"OK\r", b"\r\rELM327 v1.4b\r\r>"], timeout=15.0,
+                     result_lines=["OK\\r ends at byte index: {m[0][1]}",
+                                   "Banner starts at byte index: {m[1][0]}"],
+                     t1_line="T1 = {t1:.6f} seconds",
+                     not_found="pattern missing or timeout", vis_table=_VIS_CTRL_HEX),
+}
+
+def run_main(names):
+    """Run the named tests back to back in this process, under the timing setup."""
+    begin_timing()
+    try:
+        for key in names:
+            run_test(**TESTS[key.lower()])
+    finally:
+        end_timing()
+
+# ===== ENTRYPOINT =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="T1 response timing tests (run back to back).")
+    parser.add_argument("tests", nargs="*", type=str.lower, metavar="TEST",
+                        help=f"Tests to run: {', '.join(TESTS)} (default: all of them)")
+    args = parser.parse_args()
+    unknown = [name for name in args.tests if name not in TESTS]
+    if unknown:
+        parser.error(f"unknown test(s): {', '.join(unknown)} (choose from {', '.join(TESTS)})")
+    run_main(args.tests or list(TESTS))
@@ -14,7 +14,6 @@ ATD_DELAY           = 2
 STRSTNVM_DELAY      = 3
 
 IDLE_GAP_SEC        = 0.3                       # stop reading after this much quiet time
-READ_SLICE_SLEEP    = 0.04                      # check serial port for new data after this much time
 
 # ===== SEQUENCE =====                          # STRSTNVM will run automatically in the beginning and end
 SEQUENCE = [					                # ATPP commands will run automatically before every sequence
@@ -22,7 +21,7 @@ SEQUENCE = [					                # ATPP commands will run automatically before e
 ]
 
 from serial     import Serial
-from time       import sleep, time
+from time       import sleep
 from datetime   import datetime
 from os.path    import abspath, basename, splitext
 
@@ -30,6 +29,15 @@ from os.path    import abspath, basename, splitext
 def write_log(f, text: str):
     f.write(text + ("\n" if not text.endswith("\n") else ""))
 
+# Byte -> text lookup table, built once at import
+_VIS = [f"\\x{x:02X}" for x in range(256)]
+for x in range(0x21, 0x7F):
+    _VIS[x] = chr(x)
+_VIS[0x20] = "·"
+_VIS[0x0D] = "<CR>"
+_VIS[0x0A] = "<LF>\n"
+_VIS[0x09] = "<TAB>"
+
 def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
     """Send one command, wait, read response, and log everything."""
     write_log(log, f"\n--- [{num}] {cmd} ---")
@@ -45,32 +53,22 @@ def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
     ser.write(cmd_b)
     sleep(delay)
 
-    # Keep reading until the device is quiet for IDLE_GAP_SEC.
+    # Keep reading until the device is quiet for IDLE_GAP_SEC: read(1) blocks until the
+    # next byte, or returns empty once the line has been quiet that long.
     buf = bytearray()
-    last_rx = time()
+    ser.timeout = IDLE_GAP_SEC
     while True:
-        n = ser.in_waiting
-        if n:
-            buf += ser.read(n)
-            last_rx = time()
-            sleep(READ_SLICE_SLEEP)
-        elif (time() - last_rx) >= IDLE_GAP_SEC:
+        chunk = ser.read(1)
+        if not chunk:
             break
-        else:
-            sleep(READ_SLICE_SLEEP)
-    log_data = bytes(buf)
+        buf.extend(chunk)
+        buf.extend(ser.read(ser.in_waiting))
+    ser.timeout = 0
+    log_data = buf
 
     # Replace invisible bytes with text
-    hex_bytes = " ".join(f"{x:02X}" for x in log_data)
-    chars = []
-    for x in log_data:
-        if   x == 0x20:         chars.append("·")
-        elif x == 0xd:          chars.append("<CR>")
-        elif x == 0xa:          chars.append("<LF>\n")
-        elif x == 0x9:          chars.append("<TAB>")
-        elif 0x21 <= x <= 0x7E: chars.append(chr(x))
-        else:                   chars.append(f"\\x{x:02X}")
-    visible_bytes = "".join(chars)
+    hex_bytes = log_data.hex(" ").upper()
+    visible_bytes = "".join([_VIS[x] for x in log_data])
 
     write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes}")
     return num + 1
@@ -56,11 +56,12 @@ def send_and_read(ser, cmd):
     ser.reset_input_buffer()
     ser.write((cmd + "\r").encode())
     time.sleep(WAIT_AFTER_SEND_SEC)
-    resp = ""
+    # Collect raw bytes and decode once, so a multi-byte char split across reads survives
+    buf = bytearray()
     while ser.in_waiting:
-        resp += ser.read(ser.in_waiting).decode(errors="ignore")
+        buf.extend(ser.read(ser.in_waiting))
         time.sleep(0.05)
-    return resp
+    return buf.decode(errors="ignore")
 
 def send(connection, log, cmd):
     print(f"🟢 Sending: {cmd}")
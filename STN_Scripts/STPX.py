@@ -5,9 +5,10 @@ from datetime import datetime
 PORT        = "COM8"
 BAUD        = 9600
 TX_NEWLINE  = b"\r"
+PROMPT      = b">"      # ELM/STN prompt that ends every reply
 
 IDLE_GAP_SEC        = 0.30     # stop reading after this much quiet time
-READ_SLICE_SLEEP    = 0.04
+DRAIN_SETTLE_SEC    = 0.01     # quiet time drain() waits for before TX
 BASE_WAIT_SEC       = 2.0
 WAIT_AFTER_STRSTNVM = 3.0
 
@@ -32,20 +33,21 @@ SEQUENCE = [
 def now_str():
     return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
+# Byte -> text lookup table, built once at import
+_VIS = [f"\\x{x:02X}" for x in range(256)]
+for x in range(0x21, 0x7F):
+    _VIS[x] = chr(x)
+_VIS[0x20] = "·"
+_VIS[0x0D] = "<CR>"
+_VIS[0x0A] = "<LF>\n"
+_VIS[0x09] = "<TAB>"
+
 def visible_bytes(b: bytes) -> str:
     """Render spaces/CR/LF clearly for strict auditing."""
-    out = []
-    for x in b:
-        if x == 0x20: out.append("·")
-        elif x == 0x0D: out.append("<CR>")
-        elif x == 0x0A: out.append("<LF>\n")
-        elif x == 0x09: out.append("<TAB>")
-        elif 0x21 <= x <= 0x7E: out.append(chr(x))
-        else: out.append(f"\\x{x:02X}")
-    return "".join(out)
+    return "".join([_VIS[x] for x in b])
 
 def hex_bytes(b: bytes) -> str:
-    return " ".join(f"{x:02X}" for x in b)
+    return b.hex(" ").upper()
 
 def write_log(f, text: str):
     f.write(text + ("\n" if not text.endswith("\n") else ""))
@@ -55,25 +57,40 @@ def open_port(port, baud):
 
 def drain(ser: serial.Serial):
     """Clear any pending bytes so reads are for current command only."""
-    time.sleep(0.02)
-    while ser.in_waiting:
-        ser.read(ser.in_waiting)
-        time.sleep(0.01)
-
-def read_until_quiet(ser: serial.Serial) -> bytes:
-    buf = bytearray()
-    last_rx = time.time()
+    prev_timeout = ser.timeout
+    ser.timeout = DRAIN_SETTLE_SEC
+    ser.reset_input_buffer()
+    # Short settle so bytes still in flight are flushed too; returns once quiet for DRAIN_SETTLE_SEC
+    while ser.read(1):
+        ser.reset_input_buffer()
+    ser.timeout = prev_timeout
+
+def read_until_quiet(ser: serial.Serial, max_wait: float = 0.0) -> bytes:
+    """
+    Read until the PROMPT arrives. Without a prompt, keep listening for `max_wait`
+    from the call and then until the line is quiet for IDLE_GAP_SEC.
+    """
+    chunks = []  # joined once at the end: no bytearray regrowth, no final bytes() copy
+    prev_timeout = ser.timeout
+    deadline = time.perf_counter() + max_wait
     while True:
-        n = ser.in_waiting
-        if n:
-            buf += ser.read(n)
-            last_rx = time.time()
-            time.sleep(READ_SLICE_SLEEP)
-        else:
-            if (time.time() - last_rx) >= IDLE_GAP_SEC:
-                break
-            time.sleep(READ_SLICE_SLEEP)
-    return bytes(buf)
+        # Empty read(1) => past the deadline and quiet for at least IDLE_GAP_SEC
+        ser.timeout = max(deadline - time.perf_counter(), IDLE_GAP_SEC)
+        chunk = ser.read(1)
+        if not chunk:
+            break
+        chunk += ser.read(ser.in_waiting)
+        chunks.append(chunk)
+        if PROMPT in chunk:
+            break  # reply complete
+    ser.timeout = prev_timeout
+    return b"".join(chunks)
+
+def prepare_sequence(seq):
+    """Encode each command once, at import. Returns: [(cmd, cmd_bytes, delay), ...]"""
+    return [(cmd, cmd.encode("ascii", errors="ignore") + TX_NEWLINE, delay) for cmd, delay in seq]
+
+STEPS = prepare_sequence(SEQUENCE)
 
 # ===== LOG FILE =====
 
@@ -91,28 +108,26 @@ def main():
 
     print(f"Log file: {os.path.abspath(LOG_FILE)}")
 
-    with open(LOG_FILE, "w", encoding="utf-8") as log:
+    with open(LOG_FILE, "w", encoding="utf-8", buffering=65536) as log:
         write_log(log, "=== SEQUENCE TEST ===")
         write_log(log, f"Started: {now_str()}")
         write_log(log, f"PORT = {PORT} @ Baud = {BAUD}\n")
 
-        for idx, (cmd, delay) in enumerate(SEQUENCE):
-            write_log(log, f"\n--- [{idx}] {cmd} ---")
+        for idx, (cmd, cmd_b, delay) in enumerate(STEPS):
             print(f"[{idx}] {cmd}")
 
-            cmd_b = cmd.encode("ascii", errors="ignore")
             drain(port)
 
-            # send, wait, then read full response
-            port.write(cmd_b + TX_NEWLINE)
-            time.sleep(delay)
+            # send, then read until the prompt (`delay` is only the upper bound)
+            port.write(cmd_b)
 
-            log_data = read_until_quiet(port)
+            log_data = read_until_quiet(port, max_wait=delay)
 
-            # log raw
-            write_log(log, f"len={len(log_data)}")
-            write_log(log, visible_bytes(log_data))
-            write_log(log, "HEX: " + hex_bytes(log_data))
+            # log raw: header + section in one write
+            vis = visible_bytes(log_data)
+            if not vis.endswith("\n"):
+                vis += "\n"  # as write_log() did per line
+            write_log(log, f"\n--- [{idx}] {cmd} ---\nlen={len(log_data)}\n{vis}HEX: {hex_bytes(log_data)}")
 
     try:
         port.close()
@@ -4,7 +4,6 @@ STARTING_BAUD       = 9600
 TX_NEWLINE          = "\r"
 
 IDLE_GAP_SEC        = 0.3                       # stop reading after this much quiet time
-READ_SLICE_SLEEP    = 0.04                      # check serial port for new data after this much time
 BASE_DELAY          = 1
 STRSTNVM_DELAY      = 3
 ATZ_DELAY           = 2
@@ -23,8 +22,9 @@ SEQUENCE = [
     ("STI",        	BASE_DELAY),
 ]
 
-from serial     import Serial
-from time       import sleep, time
+import re
+from serial     import Serial, SerialException
+from time       import perf_counter
 from datetime   import datetime
 from os.path    import abspath, basename, splitext
 
@@ -32,62 +32,81 @@ from os.path    import abspath, basename, splitext
 def write_log(f, text:str):
     f.write(text + ("\n" if not text.endswith("\n") else ""))
     
-def read_until(ser:Serial, delay:float=IDLE_GAP_SEC, command=None):
-    # Keep reading until the device is quiet for IDLE_GAP_SEC.
+def read_until(ser:Serial, delay:float=IDLE_GAP_SEC, command=None, max_wait:float=0.0):
+    # Keep reading until `command` shows up, or until the device is quiet for `delay`
+    # once `max_wait` (from the call) has passed.
     buf = bytearray()
-    last_rx = time()
+    prev_timeout = ser.timeout
+    deadline = perf_counter() + max_wait
     while True:
-        n = ser.in_waiting
-        if n:
-            buf += ser.read(n)
-            last_rx = time()
-            sleep(READ_SLICE_SLEEP)
-        elif (time() - last_rx) >= delay:
+        # Empty read(1) => past the deadline and quiet for at least `delay`
+        ser.timeout = max(deadline - perf_counter(), delay)
+        chunk = ser.read(1)
+        if not chunk:
             break
-        else:
-            if command:
-                if command in buf: break
-            sleep(READ_SLICE_SLEEP)
+        buf += chunk
+        buf += ser.read(ser.in_waiting)
+        if command and command in buf:
+            break
+    ser.timeout = prev_timeout
     log_data = bytes(buf)
     
-    hex_bytes = " ".join(f"{x:02X}" if x else '\0' for x in log_data)
+    hex_bytes = log_data.hex(" ").upper()
+    if b"\0" in log_data:
+        hex_bytes = hex_bytes.replace("00", '\0')
     visible_bytes = make_visible(log_data)
 
     return log_data, visible_bytes, hex_bytes
 
-def make_visible(bytes):
-    chars = []
-    for x in bytes:
-        if not x: break
-        if   x == 0x20:         chars.append("·")
-        elif x == 0xd:          chars.append("<CR>")
-        elif x == 0xa:          chars.append("<LF>\n")
-        elif x == 0x9:          chars.append("<TAB>")
-        elif 0x21 <= x <= 0x7E: chars.append(chr(x))
-        else:                   chars.append(f"\\x{x:02X}")
-    visible_bytes = "".join(chars)
-    return visible_bytes
+# Byte -> text lookup table, built once at import
+_VIS = [f"\\x{x:02X}" for x in range(256)]
+for x in range(0x21, 0x7F):
+    _VIS[x] = chr(x)
+_VIS[0x20] = "·"
+_VIS[0x0D] = "<CR>"
+_VIS[0x0A] = "<LF>\n"
+_VIS[0x09] = "<TAB>"
+
+def make_visible(b: bytes) -> str:
+    # Stop at the first NUL, as before
+    return "".join([_VIS[x] for x in b.split(b"\0", 1)[0]])
 
 def write_log_section(log, log_data, visible_bytes, hex_bytes):
     write_log(log, f"len={len(log_data)}\n{visible_bytes}\nHEX: {hex_bytes}")
 
-def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
+# Commands main() reacts to, plus their numeric argument ("STBRT 15000", "STSBR 115200")
+CMD_RE = re.compile(r"\s*(STRSTNVM|STBRT|STSBR(?=\s))\s*(\d+)?", re.I)
+
+def prepare_sequence(seq):
+    """
+    Encode each command, render its log form and classify it once, at import.
+    Returns: [(cmd, visible_cmd, cmd_bytes, delay, is_stbrt, is_stsbr, is_strstnvm, num_arg), ...]
+    """
+    steps = []
+    for cmd, delay in seq:
+        m = CMD_RE.match(cmd)
+        kind = m.group(1).upper() if m else None
+        steps.append((
+            cmd, make_visible(bytes(cmd, 'utf-8')),
+            (cmd + TX_NEWLINE).encode("ascii", errors="ignore"), delay,
+            kind == "STBRT", kind == "STSBR", kind == "STRSTNVM",
+            int(m.group(2)) if m and m.group(2) else None,
+        ))
+    return steps
+
+def send_and_log(ser: Serial, step: tuple, log, num: int):
     """Send one command, wait, read response, and log everything."""
-    visible = make_visible(bytes(cmd, 'utf-8'))
+    cmd, visible, cmd_b, delay = step[:4]  # pre-encoded by prepare_sequence()
     write_log(log, f"\n--- [{num}] {visible} ---")
     print(f"[{num}] {visible}")
 
-    cmd += TX_NEWLINE
-    cmd_b = cmd.encode("ascii", errors="ignore")
-    
     # Flush any stale bytes before sending a command.
-    sleep(0.05)
     ser.reset_input_buffer()
 
     ser.write(cmd_b)
-    sleep(delay)
 
-    log_data, visible_bytes, hex_bytes = read_until(ser)
+    # Stop at the prompt; `delay` only bounds how long a reply without one is waited for
+    log_data, visible_bytes, hex_bytes = read_until(ser, command=COMMAND_TO_RECEIVE, max_wait=delay)
     
     if not visible_bytes:
         print('Warning: No visible bytes received')
@@ -96,23 +115,35 @@ def send_and_log(ser: Serial, cmd: str, delay: float, log, num: int):
     
     return num + 1
 
+STEPS = prepare_sequence(SEQUENCE)
+
 # ===== MAIN =====
 def main():
-    global STARTING_BAUD, TIMEOUT, SEQUENCE
+    global STARTING_BAUD, TIMEOUT
     for file in range(1):
         LOG_FILE = f"{splitext(basename(__file__))[0]}{file if file else ''}.txt"
         baud = STARTING_BAUD
         try:
-            with open(LOG_FILE, "w", encoding="utf-8") as log:
+            with open(LOG_FILE, "w", encoding="utf-8", buffering=65536) as log:
                 write_log(log, f"=== SEQUENCE TEST ===\nStarted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 print(f"Log file: {abspath(LOG_FILE)}")
                 
-                num = 0            
-                while num < len(SEQUENCE):
-                    print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
-                    write_log(log, f"\nStarted: Baud = {baud}")
-                    
-                    with Serial(PORT, baudrate=baud, timeout=0) as port:
+                num = 0
+                print(f"\nOpening PORT = {PORT} @ Baud = {baud} …")
+                # Open once and switch baud in place; reopen only if the driver refuses the change
+                port = Serial(PORT, baudrate=baud, timeout=0)
+                try:
+                    while num < len(STEPS):
+                        write_log(log, f"\nStarted: Baud = {baud}")
+                        if port.baudrate != baud:
+                            print(f"\nSwitching PORT = {PORT} to Baud = {baud} …")
+                            try:
+                                port.baudrate = baud
+                            except (ValueError, SerialException):
+                                port.close()
+                                port = Serial(PORT, baudrate=baud, timeout=0)
+                            port.reset_input_buffer()
+
                         if STARTING_BAUD != baud:
                             log_data, visible_bytes, hex_bytes = read_until(port, TIMEOUT, COMMAND_TO_RECEIVE)
                             print('Received: ', visible_bytes)
@@ -122,20 +153,23 @@ def main():
                             else:
                                 baud = STARTING_BAUD
                                 continue
-                        
-                        seq = SEQUENCE[num:]
-                        for cmd, delay in seq:
-                            num = send_and_log(port, cmd, delay, log, num)
-                            if cmd.upper().__contains__('STBRT'):
-                                TIMEOUT = int([x for x in cmd.split() if x.isdigit()][0])*1.2
-                            elif cmd.upper().__contains__('STSBR '):
+
+                        seq = STEPS[num:]
+                        for step in seq:
+                            num = send_and_log(port, step, log, num)
+                            is_stbrt, is_stsbr, is_strstnvm, arg = step[4:]
+                            if is_stbrt:
+                                TIMEOUT = arg*1.2
+                            elif is_stsbr:
                                 STARTING_BAUD = baud
-                                baud = int([x for x in cmd.split() if x.isdigit()][0])
+                                baud = arg
                                 break
-                            elif cmd.upper().__contains__('STRSTNVM') and (baud != 9600):
+                            elif is_strstnvm and (baud != 9600):
                                 STARTING_BAUD = baud = 9600
                                 TIMEOUT = 1
                                 break
+                finally:
+                    port.close()
 
         except Exception as e:
             print(f"❌ Error: {e}")
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 import argparse
+import difflib
 import re
 from pathlib import Path
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
-HEADER_RE = re.compile(r"^---\s*\[(\d+)\]\s*(.*?)\s*---\s*$")
-PLAIN_HEADER_RE = re.compile(r"^---\s*(.*?)\s*---\s*$")  # fallback if no [n]
+# One match per raw line: group 1 is the stripped header, group 3 the command ([n] optional).
+# "---".."-----" still count as headers (whose command is the header itself), as before.
+HEADER_RE = re.compile(r"\s*(---\s*(?:\[(\d+)\]\s*)?(.*?)\s*---|-{3,5})\s*")
 
 def load_blocks(path: Path):
     """
@@ -16,50 +20,35 @@ def load_blocks(path: Path):
       blocks_by_cmd_occ: OrderedDict[tuple[str,int], list[str]]
       header_to_cmdocc: dict[str, tuple[str,int]]
     """
-    text = path.read_text(encoding="utf-8", errors="replace")
-    lines = text.splitlines()
+    # No name for the decoded text: it is freed as soon as it has been split
+    lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
 
     blocks_by_header = OrderedDict()
-    current_header = None
-    current_buf = []
-
-    for ln in lines:
-        if ln.strip().startswith('---') and ln.strip().endswith('---'):
-            # flush previous
-            if current_header is not None:
-                blocks_by_header[current_header] = current_buf
-            current_header = ln.strip()
-            current_buf = []
-        else:
-            if current_header is not None:
-                current_buf.append(ln)
-            # else preamble lines (before first header) are ignored
-
-    if current_header is not None:
-        blocks_by_header[current_header] = current_buf
-
-    # Build command occurrence mapping
-    counts = defaultdict(int)
     blocks_by_cmd_occ = OrderedDict()
     header_to_cmdocc = {}
+    counts = defaultdict(int)
+    current_buf = None  # preamble lines (before first header) are ignored
 
-    for header, content in blocks_by_header.items():
-        m = HEADER_RE.match(header)
+    # Single pass: the (command, occurrence) key is assigned when a header is first seen,
+    # and both block maps share the same line list
+    for ln in lines:
+        m = HEADER_RE.fullmatch(ln)
         if m:
-            # capture command text after index
-            cmd = m.group(2).strip()
-        else:
-            m2 = PLAIN_HEADER_RE.match(header)
-            cmd = m2.group(1).strip() if m2 else header  # fallback
-
-        counts[cmd] += 1
-        key = (cmd, counts[cmd])
-        blocks_by_cmd_occ[key] = content
-        header_to_cmdocc[header] = key
+            header = m.group(1)
+            key = header_to_cmdocc.get(header)
+            if key is None:
+                cmd = m.group(3)
+                cmd = cmd.strip() if cmd is not None else header
+                counts[cmd] += 1
+                key = header_to_cmdocc[header] = (cmd, counts[cmd])
+            # a repeated header replaces the earlier block, as before
+            current_buf = blocks_by_header[header] = blocks_by_cmd_occ[key] = []
+        elif current_buf is not None:
+            current_buf.append(ln)
 
     return blocks_by_header, blocks_by_cmd_occ, header_to_cmdocc
 
-def compare_files(stn_path: Path, dspic_path: Path, out_path: Path):
+def compare_files(stn_path: Path, dspic_path: Path, out_path: Path, context: int | None = None):
     stn_h, stn_cmd, stn_map = load_blocks(stn_path)
     ds_h,  ds_cmd,  ds_map  = load_blocks(dspic_path)
 
@@ -83,74 +72,106 @@ def compare_files(stn_path: Path, dspic_path: Path, out_path: Path):
     # Pair unmatched by cmd-occ keys where both sides have same (cmd, occ)
     stn_cmd_keys = set(stn_cmd.keys())
     ds_cmd_keys  = set(ds_cmd.keys())
+    # (cmd, occ) keys already compared via their exact header, built once
+    compared_keys = {stn_map[h] for h in common_by_header}
     common_cmdocc = [k for k in stn_cmd_keys & ds_cmd_keys
-                     if (k not in [stn_map[h] for h in common_by_header])]
+                     if k not in compared_keys]
 
     diffs = []
-    lines_out = []
+    only_stn_reported = []
+    only_ds_reported = []
+    out = None  # opened on the first difference, so identical pairs write no file
+
+    def emit(*parts):
+        # Stream to disk instead of collecting every line first; same text as "\n".join(all parts)
+        nonlocal out
+        if out is None:
+            out = open(out_path, "w", encoding="utf-8", buffering=1 << 16)
+        else:
+            out.write("\n")
+        out.write("\n".join(parts))
 
     def block_text(lines):
         # Join as-is; you can tweak normalization if needed (e.g., strip trailing CRs)
         return "\n".join(lines).rstrip()
 
-    # 1) Blocks matched by exact header
-    for header in common_by_header:
-        stn_lines = stn_h[header]
-        ds_lines  = ds_h[header]
-        if stn_lines != ds_lines:
-            diffs.append(header)
-            lines_out.append(f"=== DIFF: {header} ===")
-            lines_out.append(f"--- STN ({stn_path.name}) ---")
-            lines_out.append(block_text(stn_lines) or "<empty>")
-            lines_out.append(f"--- dsPIC ({dspic_path.name}) ---")
-            lines_out.append(block_text(ds_lines) or "<empty>")
-            lines_out.append("")
-
-    # 2) Blocks matched by (command, occurrence) where header didn’t match
-    # Do them in file order using stn_cmd (preserves order seen in STN)
-    for key, stn_lines in stn_cmd.items():
-        # skip ones already compared by header
-        if key in [stn_map[h] for h in common_by_header]:
-            continue
-        if key in ds_cmd:
-            ds_lines = ds_cmd[key]
+    def emit_diff(title, stn_lines, ds_lines):
+        if context is None:
+            # Both bodies in full
+            emit(title,
+                 f"--- STN ({stn_path.name}) ---",
+                 block_text(stn_lines) or "<empty>",
+                 f"--- dsPIC ({dspic_path.name}) ---",
+                 block_text(ds_lines) or "<empty>",
+                 "")
+        else:
+            # Changed hunks only, with `context` lines around each
+            emit(title,
+                 *difflib.unified_diff(stn_lines, ds_lines,
+                                       fromfile=f"STN ({stn_path.name})", tofile=f"dsPIC ({dspic_path.name})",
+                                       n=context, lineterm=""),
+                 "")
+
+    try:
+        # 1) Blocks matched by exact header
+        for header in common_by_header:
+            stn_lines = stn_h[header]
+            ds_lines  = ds_h[header]
             if stn_lines != ds_lines:
-                cmd, occ = key
-                diffs.append(f"[{occ}] {cmd}")
-                lines_out.append(f"=== DIFF: [{occ}] {cmd} (matched by command+occurrence) ===")
-                lines_out.append(f"--- STN ({stn_path.name}) ---")
-                lines_out.append(block_text(stn_lines) or "<empty>")
-                lines_out.append(f"--- dsPIC ({dspic_path.name}) ---")
-                lines_out.append(block_text(ds_lines) or "<empty>")
-                lines_out.append("")
-
-    # 3) Report blocks only on one side (no counterpart)
-    #    Keep them, since they are meaningful differences in flow
-    only_stn_reported = []
-    for h in only_stn_headers:
-        # skip if its cmd-occurrence was already compared (paired by command+occ)
-        if stn_map[h] in ds_cmd:
-            continue
-        only_stn_reported.append(h)
-        lines_out.append(f"=== ONLY IN STN: {h} ===")
-        lines_out.append(block_text(stn_h[h]) or "<empty>")
-        lines_out.append("")
-
-    only_ds_reported = []
-    for h in only_ds_headers:
-        if ds_map[h] in stn_cmd:
-            continue
-        only_ds_reported.append(h)
-        lines_out.append(f"=== ONLY IN dsPIC: {h} ===")
-        lines_out.append(block_text(ds_h[h]) or "<empty>")
-        lines_out.append("")
-
-    if lines_out:
-        out_path.write_text("\n".join(lines_out), encoding="utf-8")
+                diffs.append(header)
+                emit_diff(f"=== DIFF: {header} ===", stn_lines, ds_lines)
+
+        # 2) Blocks matched by (command, occurrence) where header didn’t match
+        # Do them in file order using stn_cmd (preserves order seen in STN)
+        for key, stn_lines in stn_cmd.items():
+            # skip ones already compared by header
+            if key in compared_keys:
+                continue
+            if key in ds_cmd:
+                ds_lines = ds_cmd[key]
+                if stn_lines != ds_lines:
+                    cmd, occ = key
+                    diffs.append(f"[{occ}] {cmd}")
+                    emit_diff(f"=== DIFF: [{occ}] {cmd} (matched by command+occurrence) ===",
+                              stn_lines, ds_lines)
+
+        # 3) Report blocks only on one side (no counterpart)
+        #    Keep them, since they are meaningful differences in flow
+        for h in only_stn_headers:
+            # skip if its cmd-occurrence was already compared (paired by command+occ)
+            if stn_map[h] in ds_cmd:
+                continue
+            only_stn_reported.append(h)
+            emit(f"=== ONLY IN STN: {h} ===", block_text(stn_h[h]) or "<empty>", "")
+
+        for h in only_ds_headers:
+            if ds_map[h] in stn_cmd:
+                continue
+            only_ds_reported.append(h)
+            emit(f"=== ONLY IN dsPIC: {h} ===", block_text(ds_h[h]) or "<empty>", "")
+    finally:
+        if out is not None:
+            out.close()
+
+    if out is not None:
         return True, diffs, only_stn_reported, only_ds_reported
     else:
         return False, [], [], []
 
+def positive_int(text: str) -> int:
+    """argparse type for --jobs: a worker count of at least 1."""
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+def non_negative_int(text: str) -> int:
+    """argparse type for --unified: a context line count of 0 or more."""
+    n = int(text)
+    if n < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {n}")
+    return n
+
 def main():
     parser = argparse.ArgumentParser(
         description="Compare STN vs dsPIC logs per command block (--- [n] NAME ---) and write only the differences."
@@ -159,6 +180,11 @@ def main():
     parser.add_argument("dspic_folder", help="Folder containing dsPIC logs")
     parser.add_argument("-o", "--output", default="diff_output", help="Output folder for per-file diffs")
     parser.add_argument("--ext", default=".txt", help="File extension to match (default: .txt)")
+    parser.add_argument("-j", "--jobs", type=positive_int, default=None,
+                        help="Worker processes for diffing file pairs (default: CPU count, 1 = no pool)")
+    parser.add_argument("-u", "--unified", type=non_negative_int, default=None, metavar="N",
+                        help="Write differing blocks as unified diffs with N context lines "
+                             "(default: both block bodies in full)")
     args = parser.parse_args()
 
     stn_dir = Path(args.stn_folder)
@@ -184,13 +210,20 @@ def main():
     summary.append(f"Comparing {len(common_names)} paired files...")
     summary.append("")
 
-    created = 0
-    for name in common_names:
-        stn_path = stn_files[name]
-        ds_path  = ds_files[name]
-        diff_path = out_dir / f"{Path(name).stem}.diff.txt"
+    stn_paths  = [stn_files[name] for name in common_names]
+    ds_paths   = [ds_files[name] for name in common_names]
+    diff_paths = [out_dir / f"{Path(name).stem}.diff.txt" for name in common_names]
 
-        has_diff, difflist, only_stn_blocks, only_ds_blocks = compare_files(stn_path, ds_path, diff_path)
+    # Pairs are independent: diff them in parallel, results come back in name order
+    if args.jobs == 1 or len(common_names) < 2:
+        results = list(map(compare_files, stn_paths, ds_paths, diff_paths, repeat(args.unified)))
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+            results = list(ex.map(compare_files, stn_paths, ds_paths, diff_paths, repeat(args.unified)))
+
+    created = 0
+    for name, diff_path, result in zip(common_names, diff_paths, results):
+        has_diff, difflist, only_stn_blocks, only_ds_blocks = result
         if has_diff:
             created += 1
             summary.append(f"[DIFF] {name} -> {diff_path.name} "